@@ -1,19 +1,13 @@
 import sqlite3
-import functools
-from datetime import datetime  
 
-# Decorator to log SQL queries with timestamp
+from query_metrics import default_metrics, instrument_queries
+
+# Decorator to log SQL queries with timestamp. Timings, row counts and
+# query fingerprints are recorded in query_metrics.default_metrics, and
+# log lines are written by a background listener thread. Failed calls and
+# calls without a query are logged too.
 def log_queries(func):
-    @functools.wraps(func)
-    def wrapper_log(*args, **kwargs):
-        query = kwargs.get('query') or (args[0] if args else None)
-        if query:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"[{timestamp}] Executing SQL Query: {query}")
-        else:
-            print("[LOG] No SQL query provided")
-        return func(*args, **kwargs)
-    return wrapper_log
+    return instrument_queries(func, log_rate=1.0)
 
 @log_queries
 def fetch_all_users(query):
@@ -24,6 +18,8 @@ def fetch_all_users(query):
     conn.close()
     return results
 
-# Fetch users while logging the query
-users = fetch_all_users(query="SELECT * FROM users")
-print(users)
+if __name__ == "__main__":
+    # Fetch users while logging the query
+    users = fetch_all_users(query="SELECT * FROM users")
+    print(users)
+    print(default_metrics.to_prometheus())
@@ -1,39 +1,184 @@
-import sqlite3
 import functools
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import table_versions
+from db_pool import with_db_connection
 
-# Decorator: handles opening and closing the DB connection
-def with_db_connection(func):
-    """Decorator to manage DB connection lifecycle."""
-    @functools.wraps(func)
-    def wrapper_with_connection(*args, **kwargs):
-        conn = sqlite3.connect('users.db')  # Replace with your DB path if needed
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper_with_connection
 
 # Decorator: handles transaction management (commit/rollback)
 def transactional(func):
-    """Decorator to manage DB transactions."""
+    """
+    Decorator to manage DB transactions.
+
+    Tables written inside the transaction are recorded and, once it
+    commits, bumped in table_versions so cached reads of them expire.
+    """
     @functools.wraps(func)
     def wrapper_transaction(conn, *args, **kwargs):
+        tracker = table_versions.WriteTracker(conn)
         try:
             result = func(conn, *args, **kwargs)
             conn.commit()
-            return result
         except Exception as e:
             conn.rollback()
             print(f"Transaction rolled back due to: {e}")
             raise
+        finally:
+            tracker.stop()
+        table_versions.bump(tracker.tables)
+        return result
     return wrapper_transaction
 
+class GroupCommitter:
+    """
+    Writer thread that commits many transactional calls at once.
+
+    Calls submitted within max_wait seconds of each other, up to
+    max_batch of them, run in one transaction on the writer's own
+    connection, so they share a single commit (and fsync). Each call runs
+    inside a savepoint: one that raises is rolled back alone and its
+    caller gets the exception, while the rest of the batch still commits.
+    Results are only handed back once the commit has succeeded; if the
+    commit fails, every call in the batch gets that error; if the rollback
+    after it fails too, the writer stops. Submitted functions must not
+    call commit() or rollback() themselves. submit() raises RuntimeError
+    once the committer is closed.
+    """
+
+    def __init__(self, database='users.db', max_batch=64, max_wait=0.002, timeout=30.0):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._conn = sqlite3.connect(database, timeout=timeout, isolation_level=None,
+                                     check_same_thread=False)
+        self._jobs = queue.SimpleQueue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.calls = 0
+        self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(conn, *args, **kwargs); returns a Future of its result."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("cannot submit to a closed GroupCommitter")
+            self._jobs.put((future, func, args, kwargs))
+        return future
+
+    def _collect(self, first):
+        jobs = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(jobs) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self._jobs.get(timeout=remaining) if remaining > 0 else self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self._jobs.put(None)
+                break
+            jobs.append(job)
+        return jobs
+
+    def _run(self):
+        try:
+            while True:
+                first = self._jobs.get()
+                if first is None:
+                    break
+                self._commit_batch(self._collect(first))
+        finally:
+            with self._lock:
+                self._closed = True
+            # Only left if the writer died: fail what nobody will run
+            error = RuntimeError("GroupCommitter writer thread stopped")
+            while True:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None and job[0].set_running_or_notify_cancel():
+                    job[0].set_exception(error)
+            self._conn.close()
+
+    def _commit_batch(self, jobs):
+        conn = self._conn
+        done = []  # (future, result) waiting on the commit
+        tracker = table_versions.WriteTracker(conn)
+        try:
+            conn.execute("BEGIN")
+            for future, func, args, kwargs in jobs:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT call")
+                try:
+                    result = func(conn, *args, **kwargs)
+                except BaseException as e:
+                    conn.execute("ROLLBACK TO call")
+                    conn.execute("RELEASE call")
+                    future.set_exception(e)
+                    continue
+                conn.execute("RELEASE call")
+                done.append((future, result))
+            conn.execute("COMMIT")
+        except BaseException as e:
+            try:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            finally:
+                # Even if the rollback fails, no caller is left waiting
+                for future, func, args, kwargs in jobs:
+                    if not future.done():
+                        future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        finally:
+            tracker.stop()
+        table_versions.bump(tracker.tables)
+        self.batches += 1
+        self.calls += len(done)
+        for future, result in done:
+            future.set_result(result)
+
+    def close(self):
+        """Commit what is queued, then stop the writer thread."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._jobs.put(None)
+        self._thread.join()
+
+
+# Decorator: runs the function through a GroupCommitter
+def group_commit(committer):
+    """
+    Decorator for transactional functions to run them through `committer`.
+
+    Calling the function blocks until its batch commits and returns its
+    result (or raises its error); func.submit(...) returns a Future
+    instead, so one thread can queue many calls before waiting.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper_group_commit(*args, **kwargs):
+            return committer.submit(func, *args, **kwargs).result()
+        wrapper_group_commit.submit = functools.partial(committer.submit, func)
+        return wrapper_group_commit
+    return decorator
+
 @with_db_connection
 @transactional
 def update_user_email(conn, user_id, new_email):
     cursor = conn.cursor()
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
 
-# Example usage
-update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
+if __name__ == "__main__":
+    # Example usage
+    update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
@@ -1,38 +1,218 @@
-import time
+import asyncio
+import logging
+import random
 import sqlite3
+import threading
+import time
 import functools
 
-# Decorator to manage DB connection
-def with_db_connection(func):
-    """Decorator to handle DB connection lifecycle."""
-    @functools.wraps(func)
-    def wrapper_with_connection(*args, **kwargs):
-        conn = sqlite3.connect('users.db')  # Update path if needed
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper_with_connection
+from db_pool import with_db_connection
+
+logger = logging.getLogger(__name__)
+
+# OperationalError messages that describe a transient condition
+RETRYABLE_MESSAGES = (
+    'database is locked',
+    'database table is locked',
+    'database schema has changed',
+    'no pooled connection',
+)
+
+
+def is_retryable(error):
+    """True for errors worth retrying: lock contention, busy pool, timeouts."""
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return any(text in message for text in RETRYABLE_MESSAGES)
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the database while the breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast after failure_threshold retryable failures in a row.
+
+    Once open, calls raise CircuitOpenError for reset_timeout seconds;
+    then one trial call is let through, and its outcome closes the
+    breaker or opens it again. Share one instance between the functions
+    that hit the same database.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self.rejected = 0
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self._clock() - self.opened_at < self.reset_timeout:
+            return 'open'
+        return 'half-open'
+
+    def allow(self):
+        """
+        Raise CircuitOpenError unless a call may go ahead. Returns True if
+        the call is the half-open trial, which must end in record_success(),
+        record_failure() or release_trial().
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            if self._clock() - self.opened_at >= self.reset_timeout and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+        raise CircuitOpenError("circuit open: database calls are failing")
+
+    def release_trial(self):
+        """Free the trial slot of a call that ended without an outcome (e.g. cancelled)."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = self._clock()
+            self._trial_running = False
+
+
+class Attempts:
+    """
+    Retry bookkeeping for one call, shared by the sync and async decorators
+    and db_operation. before() runs ahead of each attempt, then exactly one
+    of succeeded(), failed(error) or abandoned().
+    """
+
+    def __init__(self, retries, delay, max_delay, deadline, retry_if, breaker, clock):
+        self.retries = retries
+        self.delay = delay
+        self.max_delay = max_delay
+        self.retry_if = retry_if
+        self.breaker = breaker
+        self.clock = clock
+        self.deadline = clock() + deadline if deadline is not None else None
+        self.attempt = 0
+        self.trial = False
+
+    def before(self):
+        if self.breaker is not None:
+            self.trial = self.breaker.allow()
+
+    def abandoned(self):
+        """The attempt was cancelled or interrupted; it says nothing about the database."""
+        if self.trial:
+            self.trial = False
+            self.breaker.release_trial()
+
+    def succeeded(self):
+        self.trial = False
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def failed(self, error):
+        """Seconds to wait before the next attempt, or None to give up."""
+        self.trial = False
+        self.attempt += 1
+        retryable = self.retry_if(error)
+        if self.breaker is not None:
+            # A fatal error still means the database answered
+            if retryable:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        if not retryable:
+            logger.warning("Attempt %d failed with a fatal error: %s", self.attempt, error)
+            return None
+        if self.attempt >= self.retries:
+            logger.warning("All %d retry attempts failed: %s", self.retries, error)
+            return None
+        # Full jitter: anywhere between 0 and the exponential backoff cap
+        pause = random.uniform(0, min(self.max_delay, self.delay * 2 ** (self.attempt - 1)))
+        if self.deadline is not None and self.clock() + pause >= self.deadline:
+            logger.warning("Attempt %d failed and the retry deadline has passed: %s",
+                           self.attempt, error)
+            return None
+        logger.info("Attempt %d failed: %s; retrying in %.3fs", self.attempt, error, pause)
+        return pause
+
 
 # Decorator to retry failed DB operations
-def retry_on_failure(retries=3, delay=2):
-    """Retry decorator with customizable retries and delay."""
+def retry_on_failure(retries=3, delay=2, max_delay=30.0, deadline=None,
+                     retry_if=is_retryable, breaker=None, clock=time.monotonic,
+                     sleep=time.sleep):
+    """
+    Retry decorator with exponential backoff and full jitter.
+
+    Up to `retries` attempts are made. The wait before retry n is random
+    in [0, min(max_delay, delay * 2 ** (n - 1))]. Only errors for which
+    retry_if(error) is true are retried; others are raised at once.
+    `deadline` caps the seconds one call may spend on retries, and a
+    shared CircuitBreaker makes calls fail fast while the database is
+    down.
+    """
     def decorator(func):
         @functools.wraps(func)
         def wrapper_retry(*args, **kwargs):
-            attempts = 0
-            while attempts < retries:
+            attempts = Attempts(retries, delay, max_delay, deadline, retry_if, breaker, clock)
+            while True:
+                attempts.before()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    pause = attempts.failed(e)
+                    if pause is None:
+                        raise
+                    sleep(pause)
+                    continue
+                except BaseException:
+                    attempts.abandoned()
+                    raise
+                attempts.succeeded()
+                return result
+        return wrapper_retry
+    return decorator
+
+
+def async_retry_on_failure(retries=3, delay=2, max_delay=30.0, deadline=None,
+                           retry_if=is_retryable, breaker=None, clock=time.monotonic):
+    """retry_on_failure for coroutine functions; waits with asyncio.sleep."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper_retry(*args, **kwargs):
+            attempts = Attempts(retries, delay, max_delay, deadline, retry_if, breaker, clock)
+            while True:
+                attempts.before()
                 try:
-                    return func(*args, **kwargs)
+                    result = await func(*args, **kwargs)
                 except Exception as e:
-                    attempts += 1
-                    print(f"Attempt {attempts} failed: {e}")
-                    if attempts < retries:
-                        time.sleep(delay)
-                    else:
-                        print("All retry attempts failed.")
+                    pause = attempts.failed(e)
+                    if pause is None:
                         raise
+                    await asyncio.sleep(pause)
+                    continue
+                except BaseException:
+                    # e.g. CancelledError from asyncio.wait_for's timeout
+                    attempts.abandoned()
+                    raise
+                attempts.succeeded()
+                return result
         return wrapper_retry
     return decorator
 
@@ -43,6 +223,8 @@ def fetch_users_with_retry(conn):
     cursor.execute("SELECT * FROM users")
     return cursor.fetchall()
 
-# Run and print results
-users = fetch_users_with_retry()
-print(users)
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    # Run and print results
+    users = fetch_users_with_retry()
+    print(users)
@@ -1,47 +1,309 @@
-import sqlite3
 import functools
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import table_versions
+from db_pool import with_db_connection
+
+_MISSING = object()
+
+
+def freeze(value):
+    """Hashable stand-in for query parameters (lists/dicts become tuples)."""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _sizeof(result):
+    """Approximate retained size in bytes of a fetchall() result."""
+    size = sys.getsizeof(result)
+    if isinstance(result, (list, tuple)):
+        for row in result:
+            size += sys.getsizeof(row)
+            if isinstance(row, (list, tuple)):
+                size += sum(sys.getsizeof(v) for v in row)
+    return size
+
+
+class LRUCache:
+    """
+    Thread-safe query result cache with LRU eviction and optional TTL.
+
+    Entries are evicted least-recently-used first once there are more
+    than max_entries of them or, if max_bytes is set, once their
+    approximate total size exceeds it. With ttl (seconds) set, entries
+    older than ttl count as misses and are dropped on access. Sizes come
+    from sizeof(value), or from a sizeof passed to set().
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None, ttl=None,
+                 sizeof=_sizeof, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.RLock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key, default=None, count=True, valid=None):
+        """
+        Cached value for key, or default. If `valid` is given, a value
+        for which valid(value) is false is dropped and treated as a miss.
+        """
+        found = self.lookup(key, valid=valid, count=count)
+        return default if found is None else found[0]
+
+    def lookup(self, key, valid=None, stale_for=0.0, count=True):
+        """
+        (value, stale) for key, or None on a miss. An entry less than
+        stale_for seconds past its TTL is returned with stale=True rather
+        than dropped, so the caller can serve it while it refreshes.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            stale = False
+            if entry is not None and entry[1] is not None:
+                overdue = self._clock() - entry[1]
+                if overdue >= stale_for:
+                    self._remove(key)
+                    self.expirations += 1
+                    entry = None
+                else:
+                    stale = overdue >= 0
+            if entry is not None and valid is not None and not valid(entry[0]):
+                self._remove(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[0], stale
+
+    def set(self, key, value, ttl=_MISSING, sizeof=None):
+        """
+        Cache value under key. `sizeof` measures this value in place of
+        the cache's own sizeof, e.g. for a value wrapped with metadata.
+        """
+        ttl = self.ttl if ttl is _MISSING else ttl
+        if self.max_bytes is None:
+            size = 0
+        else:
+            size = (self.sizeof if sizeof is None else sizeof)(value)
+        expires_at = self._clock() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self.bytes += size
+            while self._entries and (
+                    len(self._entries) > self.max_entries
+                    or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
 
 # In-memory query result cache
-query_cache = {}
+query_cache = LRUCache(max_entries=1024)
 
-# Decorator to manage database connection
-def with_db_connection(func):
-    """Decorator to handle DB connection lifecycle."""
-    @functools.wraps(func)
-    def wrapper_with_connection(*args, **kwargs):
-        conn = sqlite3.connect('users.db')  # Adjust path if needed
+
+def is_current(entry):
+    """True if a (result, deps) entry has not been invalidated by a write."""
+    return table_versions.is_current(entry[1])
+
+
+def result_sizeof(cache):
+    """sizeof for the (result, deps) pairs cache_query stores in `cache`."""
+    return lambda entry: cache.sizeof(entry[0])
+
+class _Flight:
+    """One in-progress query execution that concurrent callers wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+# Decorator to cache query results
+def cache_query(func=None, *, cache=None, single_flight=False,
+                stale_while_revalidate=0.0, refresh_connect=None):
+    """
+    Cache query results to avoid redundant database calls.
+
+    Use as @cache_query (shared module-level query_cache) or
+    @cache_query(cache=LRUCache(...)). Results are keyed on the query and
+    any bound parameters passed after it, so the same SQL with different
+    parameters is cached separately.
+
+    Each result is stored with the generations of the tables the query
+    reads (see table_versions) and is dropped once a transactional write
+    to any of them commits.
+
+    single_flight=True makes concurrent misses on the same key wait for
+    one execution and share its result (or exception).
+
+    stale_while_revalidate (seconds) keeps serving an entry for that long
+    after its TTL runs out while one caller refreshes it. The refresh runs
+    on a background thread with a connection from refresh_connect() if
+    given; otherwise the first caller to see the stale entry refreshes it
+    inline and concurrent callers get the stale value. Entries invalidated
+    by a write are never served stale.
+    """
+    if func is None:
+        return functools.partial(cache_query, cache=cache, single_flight=single_flight,
+                                 stale_while_revalidate=stale_while_revalidate,
+                                 refresh_connect=refresh_connect)
+    store = query_cache if cache is None else cache
+    sizeof = result_sizeof(store)
+    flights = {}
+    refreshing = set()
+    flights_lock = threading.Lock()
+    stats = {'executions': 0, 'coalesced': 0, 'stale_served': 0}
+
+    def load(conn, key, query, args, kwargs):
+        # Take the generations before running the query, so a write that
+        # commits while it runs leaves the entry already stale
+        deps = table_versions.snapshot(table_versions.read_tables(query))
+        with flights_lock:
+            stats['executions'] += 1
+        result = func(conn, query, *args, **kwargs)
+        store.set(key, (result, deps), sizeof=sizeof)
+        return result
+
+    def refresh_in_background(key, query, args, kwargs):
         try:
-            return func(conn, *args, **kwargs)
+            conn = refresh_connect()
+            try:
+                load(conn, key, query, args, kwargs)
+            finally:
+                conn.close()
         finally:
-            conn.close()
-    return wrapper_with_connection
+            with flights_lock:
+                refreshing.discard(key)
+
+    def revalidate(conn, key, query, args, kwargs, stale_result):
+        with flights_lock:
+            if key in refreshing:
+                stats['stale_served'] += 1
+                return stale_result
+            refreshing.add(key)
+        if refresh_connect is not None:
+            with flights_lock:
+                stats['stale_served'] += 1
+            threading.Thread(target=refresh_in_background,
+                             args=(key, query, args, kwargs), daemon=True).start()
+            return stale_result
+        try:
+            return load(conn, key, query, args, kwargs)
+        finally:
+            with flights_lock:
+                refreshing.discard(key)
+
+    def load_once(conn, key, query, args, kwargs):
+        with flights_lock:
+            flight = flights.get(key)
+            if flight is None:
+                # The previous leader may have finished since our lookup
+                found = store.lookup(key, valid=is_current, count=False)
+                if found is not None:
+                    return found[0][0]
+                flight = flights[key] = _Flight()
+                leader = True
+            else:
+                stats['coalesced'] += 1
+                leader = False
+        if not leader:
+            return flight.wait()
+        try:
+            flight.result = load(conn, key, query, args, kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with flights_lock:
+                del flights[key]
+            flight.done.set()
 
-# Decorator to cache query results
-def cache_query(func):
-    """Cache query results to avoid redundant database calls."""
     @functools.wraps(func)
     def wrapper_cache(conn, query, *args, **kwargs):
-        if query in query_cache:
-            print("[Cache] Returning cached result")
-            return query_cache[query]
-        print("[DB] Executing and caching new query")
-        result = func(conn, query, *args, **kwargs)
-        query_cache[query] = result
-        return result
+        key = (query, freeze(args), freeze(kwargs)) if args or kwargs else query
+        found = store.lookup(key, valid=is_current, stale_for=stale_while_revalidate)
+        if found is not None:
+            (result, _), stale = found
+            if not stale:
+                return result
+            return revalidate(conn, key, query, args, kwargs, result)
+        if single_flight:
+            return load_once(conn, key, query, args, kwargs)
+        return load(conn, key, query, args, kwargs)
+    wrapper_cache.cache = store
+    wrapper_cache.stats = stats
     return wrapper_cache
 
 @with_db_connection
 @cache_query
-def fetch_users_with_cache(conn, query):
+def fetch_users_with_cache(conn, query, params=()):
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute(query, params)
     return cursor.fetchall()
 
-# First call: hits the database and caches result
-users = fetch_users_with_cache(query="SELECT * FROM users")
+if __name__ == "__main__":
+    # First call: hits the database and caches result
+    users = fetch_users_with_cache(query="SELECT * FROM users")
 
-# Second call: uses cached result
-users_again = fetch_users_with_cache(query="SELECT * FROM users")
+    # Second call: uses cached result
+    users_again = fetch_users_with_cache(query="SELECT * FROM users")
 
-# Optional: print to verify both results are identical
-print(users == users_again)  # Should print: True
+    # Optional: print to verify both results are identical
+    print(users == users_again)  # Should print: True
+    print(query_cache.stats())
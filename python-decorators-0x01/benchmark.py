@@ -0,0 +1,773 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the SQLite decorator toolkit.
+
+Each benchmark builds its own users table in a scratch database:
+
+    ./benchmark.py --rows 1000000 load
+    ./benchmark.py cache --requests 200000 --max-entries 1000
+    ./benchmark.py invalidation --write-ratio 0.05
+    ./benchmark.py coalesce --threads 64
+    ./benchmark.py pool --calls 100000
+    ./benchmark.py statements --calls 1000000
+    ./benchmark.py instrument --calls 200000
+    ./benchmark.py slow --threshold 0.002
+    ./benchmark.py retry --threads 32 --outage 1.0
+    ./benchmark.py group --updates 20000
+    ./benchmark.py fused --calls 200000
+"""
+import argparse
+import contextlib
+import csv
+import importlib
+import itertools
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+import create_table
+import db_operation
+import db_pool
+import query_metrics
+import slow_queries
+
+_MISSING = object()
+
+USERS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL UNIQUE,
+        age INTEGER NOT NULL
+    )
+"""
+
+
+def write_csv(path, rows, duplicate_every=50):
+    """CSV shaped like user_data.csv; every duplicate_every-th email repeats."""
+    rng = random.Random(0)
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(('user_id', 'name', 'email', 'age'))
+        for i in range(rows):
+            n = i - 1 if duplicate_every and i % duplicate_every == 0 and i else i
+            writer.writerow((uuid.UUID(int=rng.getrandbits(128), version=4),
+                             f"User {i}", f"user{n}@example.com", rng.randint(18, 120)))
+
+
+def reset_db(path):
+    """Empty users table at `path`, in rollback-journal mode."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    conn = sqlite3.connect(path)
+    conn.execute(USERS_SCHEMA)
+    conn.commit()
+    return conn
+
+
+def build_users(path, rows):
+    """users table at `path` with `rows` synthetic users."""
+    conn = reset_db(path)
+    rng = random.Random(0)
+    conn.executemany("INSERT INTO users(name, email, age) VALUES (?, ?, ?)",
+                     ((f"User {i}", f"user{i}@example.com", rng.randint(18, 120))
+                      for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def per_row_insert(connection, filename):
+    """The previous loader: SELECT + INSERT in its own transaction per row."""
+    inserted = skipped = 0
+    for name, email, age in create_table.read_csv_data(filename):
+        with connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT email FROM users WHERE email=?", (email,))
+            if cursor.fetchone():
+                skipped += 1
+                continue
+            cursor.execute("INSERT INTO users(name, email, age) VALUES (?, ?, ?)",
+                           (name, email, age))
+            inserted += 1
+    return {'inserted': inserted, 'skipped': skipped}
+
+
+def bench_load(args):
+    """create_table loader: per-row transactions vs bulk upsert."""
+    write_csv(args.csv, args.rows)
+    print(f"{'loader':>18} {'rows':>9} {'inserted':>9} {'skipped':>8} {'rows/sec':>10}")
+    # The per-row loader is too slow for large files; time it on a prefix
+    baseline_rows = min(args.rows, args.baseline_rows)
+    baseline_csv = args.csv + '.head'
+    write_csv(baseline_csv, baseline_rows)
+    loaders = (
+        ("per-row", lambda conn: per_row_insert(conn, baseline_csv), baseline_rows),
+        ("bulk upsert", lambda conn: create_table.insert_data(conn, args.csv), args.rows),
+        ("bulk upsert + WAL", lambda conn: create_table.insert_data(
+            conn, args.csv, fast_load=True), args.rows),
+    )
+    rates = []
+    for name, load, rows in loaders:
+        conn = reset_db(args.db)
+        start = time.perf_counter()
+        summary = load(conn)
+        rate = rows / (time.perf_counter() - start)
+        conn.close()
+        rates.append(rate)
+        print(f"{name:>18} {rows:>9} {summary['inserted']:>9} {summary['skipped']:>8} {rate:>10.0f}")
+    print(f"speedup: {rates[1] / rates[0]:.0f}x (bulk), {rates[2] / rates[0]:.0f}x (bulk + WAL)")
+
+
+class UnboundedCache(dict):
+    """The old global dict cache, behind the LRUCache get/set interface."""
+
+    def lookup(self, key, valid=None, stale_for=0.0, count=True):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            return None
+        if valid is not None and not valid(value):
+            del self[key]
+            return None
+        return value, False
+
+    def set(self, key, value, ttl=None, sizeof=None):
+        self[key] = value
+
+    def stats(self):
+        return {'entries': len(self)}
+
+
+def zipf_keys(n_keys, requests, s, seed=0):
+    """`requests` keys in 1..n_keys drawn from a Zipf(s) popularity curve."""
+    cum_weights = list(itertools.accumulate(1 / rank ** s for rank in range(1, n_keys + 1)))
+    keys = random.Random(seed).choices(range(1, n_keys + 1), cum_weights=cum_weights, k=requests)
+    # Shuffle which ids are popular so they are not just the lowest ones
+    ids = list(range(1, n_keys + 1))
+    random.Random(seed + 1).shuffle(ids)
+    return [ids[k - 1] for k in keys]
+
+
+def bench_cache(args):
+    """cache_query: unbounded dict vs bounded LRU on a Zipfian workload."""
+    cache_module = importlib.import_module('4-cache_query')
+    build_users(args.db, args.rows)
+    keys = zipf_keys(min(args.keys, args.rows), args.requests, args.zipf_s)
+    query = "SELECT * FROM users WHERE id = ?"
+    caches = (
+        ("unbounded dict", UnboundedCache),
+        (f"LRU {args.max_entries}", lambda: cache_module.LRUCache(max_entries=args.max_entries)),
+    )
+    print(f"{args.requests} requests over {len(set(keys))} ids, Zipf s={args.zipf_s}")
+    print(f"{'cache':>16} {'hit rate':>9} {'entries':>8} {'KiB':>9} {'req/sec':>10}")
+    for name, make_cache in caches:
+        conn = sqlite3.connect(args.db)
+        for traced in (False, True):
+            cache = make_cache()
+            lookup = cache_module.cache_query(cache=cache)(_lookup_user)
+            if traced:
+                tracemalloc.start()
+                before = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            for user_id in keys:
+                lookup(conn, query, (user_id,))
+            elapsed = time.perf_counter() - start
+            if traced:
+                kib = (tracemalloc.get_traced_memory()[0] - before) / 1024
+                tracemalloc.stop()
+            else:
+                rate = args.requests / elapsed
+                hits = args.requests - _lookup_user.calls
+            _lookup_user.calls = 0
+        conn.close()
+        print(f"{name:>16} {hits / args.requests:>9.1%} {len(cache):>8} {kib:>9.0f} {rate:>10.0f}")
+
+
+def bench_invalidation(args):
+    """cache_query under a read/write mix: stale reads and hit rate."""
+    cache_module = importlib.import_module('4-cache_query')
+    transactional = importlib.import_module('2-transactional').transactional
+    build_users(args.db, args.rows)
+    keys = zipf_keys(min(args.keys, args.rows), args.requests, args.zipf_s)
+    rng = random.Random(2)
+    ops = [rng.random() < args.write_ratio for _ in keys]
+    query = "SELECT email FROM users WHERE id = ?"
+    update = "UPDATE users SET email = ? WHERE id = ?"
+
+    def plain_update(conn, user_id, email):
+        conn.execute(update, (email, user_id))
+        conn.commit()
+
+    @transactional
+    def tracked_update(conn, user_id, email):
+        conn.execute(update, (email, user_id))
+
+    print(f"{args.requests} ops, {args.write_ratio:.0%} writes, Zipf s={args.zipf_s}")
+    print(f"{'writes':>22} {'hit rate':>9} {'stale reads':>12} {'ops/sec':>10}")
+    for name, write in (("untracked (old cache)", plain_update),
+                        ("transactional", tracked_update)):
+        build_users(args.db, args.rows)
+        conn = sqlite3.connect(args.db)
+        lookup = cache_module.cache_query(
+            cache=cache_module.LRUCache(max_entries=args.max_entries))(_lookup_user)
+        emails = {}
+        reads = stale = 0
+        start = time.perf_counter()
+        for n, (user_id, is_write) in enumerate(zip(keys, ops)):
+            if is_write:
+                emails[user_id] = f"w{n}@example.com"
+                write(conn, user_id, emails[user_id])
+                continue
+            reads += 1
+            email = lookup(conn, query, (user_id,))[0][0]
+            stale += email != emails.get(user_id, f"user{user_id - 1}@example.com")
+        rate = args.requests / (time.perf_counter() - start)
+        conn.close()
+        hits = reads - _lookup_user.calls
+        _lookup_user.calls = 0
+        print(f"{name:>22} {hits / reads:>9.1%} {stale:>12} {rate:>10.0f}")
+
+
+def _run_threads(threads, target):
+    """Run target(i, barrier) on `threads` threads started together."""
+    barrier = threading.Barrier(threads)
+    workers = [threading.Thread(target=target, args=(i, barrier)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def bench_coalesce(args):
+    """cache_query stampedes: executions per key with and without single-flight."""
+    cache_module = importlib.import_module('4-cache_query')
+    build_users(args.db, args.rows)
+    # Unindexed aggregate: every execution is a full scan of users
+    query = "SELECT COUNT(*), AVG(id) FROM users WHERE age = ?"
+    ages = list(range(18, 18 + args.distinct))
+
+    print(f"cold cache: {args.threads} threads each asking for the same {args.distinct} keys")
+    print(f"{'mode':>16} {'executions/key':>15} {'seconds':>8}")
+    for name, single_flight in (("plain", False), ("single-flight", True)):
+        lookup = cache_module.cache_query(cache=cache_module.LRUCache(),
+                                          single_flight=single_flight)(_lookup_user)
+
+        def stampede(i, barrier):
+            conn = sqlite3.connect(args.db, check_same_thread=False)
+            order = ages[:]
+            random.Random(i).shuffle(order)
+            barrier.wait()
+            for age in order:
+                lookup(conn, query, (age,))
+            conn.close()
+
+        start = time.perf_counter()
+        _run_threads(args.threads, stampede)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>16} {lookup.stats['executions'] / args.distinct:>15.1f} {elapsed:>8.2f}")
+
+    print(f"hot key, ttl {args.ttl}s: {args.threads} threads for {args.seconds}s")
+    print(f"{'mode':>16} {'executions':>11} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    modes = (
+        ("single-flight", {}),
+        ("+ SWR inline", {'stale_while_revalidate': 10.0}),
+        ("+ SWR thread", {'stale_while_revalidate': 10.0,
+                          'refresh_connect': lambda: sqlite3.connect(args.db)}),
+    )
+    for name, options in modes:
+        lookup = cache_module.cache_query(cache=cache_module.LRUCache(ttl=args.ttl),
+                                          single_flight=True, **options)(_lookup_user)
+        latencies = [[] for _ in range(args.threads)]
+
+        def hammer(i, barrier):
+            conn = sqlite3.connect(args.db, check_same_thread=False)
+            barrier.wait()
+            deadline = time.perf_counter() + args.seconds
+            while True:
+                start = time.perf_counter()
+                if start > deadline:
+                    break
+                lookup(conn, query, (ages[0],))
+                latencies[i].append(time.perf_counter() - start)
+                time.sleep(0.001)
+            conn.close()
+
+        _run_threads(args.threads, hammer)
+        samples = sorted(sum(latencies, []))
+        p99 = samples[int(len(samples) * 0.99)]
+        print(f"{name:>16} {lookup.stats['executions']:>11} {statistics.median(samples) * 1e3:>8.3f} "
+              f"{p99 * 1e3:>8.3f} {samples[-1] * 1e3:>8.2f}")
+
+
+def connect_per_call(database):
+    """The previous with_db_connection: a fresh connection for every call."""
+    def decorator(func):
+        def wrapper_with_connection(*args, **kwargs):
+            conn = sqlite3.connect(database)
+            try:
+                return func(conn, *args, **kwargs)
+            finally:
+                conn.close()
+        return wrapper_with_connection
+    return decorator
+
+
+def bench_pool(args):
+    """get_user_by_id latency: connection per call vs pooled."""
+    get_user_by_id = importlib.import_module('1-with_db_connection').get_user_by_id
+    build_users(args.db, args.rows)
+    pool = db_pool.configure(args.db, size=args.threads)
+    variants = (
+        ("connect per call", connect_per_call(args.db)(get_user_by_id.__wrapped__)),
+        ("pooled", get_user_by_id),
+    )
+    rng = random.Random(0)
+    ids = [rng.randint(1, args.rows) for _ in range(args.calls)]
+    print(f"{'with_db_connection':>18} {'threads':>7} {'mean us':>8} {'p99 us':>8} {'calls/sec':>10}")
+    for name, lookup in variants:
+        for threads in sorted({1, args.threads}):
+            latencies = [[] for _ in range(threads)]
+
+            def worker(i, barrier):
+                barrier.wait()
+                timings = latencies[i]
+                for user_id in ids[i::threads]:
+                    start = time.perf_counter()
+                    lookup(user_id)
+                    timings.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            _run_threads(threads, worker)
+            elapsed = time.perf_counter() - start
+            samples = sorted(sum(latencies, []))
+            p99 = samples[int(len(samples) * 0.99)]
+            print(f"{name:>18} {threads:>7} {statistics.fmean(samples) * 1e6:>8.1f} "
+                  f"{p99 * 1e6:>8.1f} {len(samples) / elapsed:>10.0f}")
+    print(pool.stats())
+    pool.close()
+
+
+def bench_statements(args):
+    """1M point lookups by id: statement reuse vs re-preparing every call."""
+    get_user_by_id = importlib.import_module('1-with_db_connection').get_user_by_id
+    build_users(args.db, args.rows)
+    rng = random.Random(0)
+    ids = [rng.randint(1, args.rows) for _ in range(args.calls)]
+    baseline_calls = min(args.calls, args.baseline_calls)
+    variants = (
+        ("connect per call", None, baseline_calls),
+        ("pooled, no cache", {'statement_cache_size': 0, 'count_statements': True}, args.calls),
+        ("pooled, LRU 128", {'statement_cache_size': 128, 'count_statements': True}, args.calls),
+        ("pooled, uncounted", {'statement_cache_size': 128}, args.calls),
+    )
+    print(f"{'variant':>18} {'calls':>8} {'us/call':>8} {'stmt hits':>10} {'stmt misses':>12}")
+    for name, options, calls in variants:
+        if options is None:
+            lookup, pool = connect_per_call(args.db)(get_user_by_id.__wrapped__), None
+        else:
+            lookup, pool = get_user_by_id, db_pool.configure(args.db, size=1, **options)
+        start = time.perf_counter()
+        for user_id in ids[:calls]:
+            lookup(user_id)
+        per_call = (time.perf_counter() - start) / calls
+        stats = pool.stats() if pool else {}
+        print(f"{name:>18} {calls:>8} {per_call * 1e6:>8.2f} "
+              f"{stats.get('statement_hits', '-'):>10} {stats.get('statement_misses', '-'):>12}")
+    db_pool.default_pool().close()
+
+
+def print_log_queries(func):
+    """The previous log_queries: format a timestamp and print every query."""
+    def wrapper_log(*args, **kwargs):
+        query = kwargs.get('query') or (args[0] if args else None)
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"[{timestamp}] Executing SQL Query: {query}")
+        return func(*args, **kwargs)
+    return wrapper_log
+
+
+def bench_instrument(args):
+    """Per-call overhead of query logging and instrumentation."""
+    def run_query(query):
+        return [(1, 'User 1', 'user1@example.com', 42)]
+
+    metrics = query_metrics.QueryMetrics()
+    query_metrics.start_log_sink(logging.NullHandler())
+    variants = (
+        ("bare", run_query),
+        ("print log_queries", print_log_queries(run_query)),
+        ("sample_rate=0", query_metrics.instrument_queries(run_query, metrics=metrics, sample_rate=0)),
+        ("sample_rate=0.01", query_metrics.instrument_queries(run_query, metrics=metrics,
+                                                              sample_rate=0.01)),
+        ("sample_rate=1", query_metrics.instrument_queries(run_query, metrics=metrics)),
+        ("+ queue log sink", query_metrics.instrument_queries(run_query, metrics=metrics,
+                                                              log_rate=1.0)),
+    )
+    queries = [f"SELECT * FROM users WHERE id = {i % 1000}" for i in range(args.calls)]
+    print(f"{'variant':>18} {'us/call':>8} {'overhead us':>12}")
+    bare = None
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        timings = []
+        for name, func in variants:
+            start = time.perf_counter()
+            for query in queries:
+                func(query=query)
+            timings.append((name, (time.perf_counter() - start) / args.calls))
+    query_metrics.stop_log_sink()
+    for name, per_call in timings:
+        bare = per_call if bare is None else bare
+        print(f"{name:>18} {per_call * 1e6:>8.2f} {(per_call - bare) * 1e6:>12.2f}")
+    print(f"recorded {sum(s['count'] for s in metrics.snapshot().values())} calls "
+          f"under {len(metrics.snapshot())} fingerprint(s)")
+
+
+def bench_slow(args):
+    """Slow-query report on a mixed workload, before and after indexing age."""
+    build_users(args.db, args.rows)
+    pool = db_pool.ConnectionPool(args.db, size=1)
+    slow_log = slow_queries.SlowQueryLog(threshold=args.threshold)
+    watch = slow_queries.detect_slow_queries(log=slow_log)
+
+    @db_pool.with_db_connection(pool=pool)
+    @watch
+    def user_by_email(conn, email):
+        return conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+
+    @db_pool.with_db_connection(pool=pool)
+    @watch
+    def users_by_age(conn, age):
+        return conn.execute("SELECT id, name FROM users WHERE age = ?", (age,)).fetchall()
+
+    @db_pool.with_db_connection(pool=pool)
+    @watch
+    def oldest_users(conn, limit):
+        return conn.execute("SELECT * FROM users ORDER BY age DESC LIMIT ?", (limit,)).fetchall()
+
+    rng = random.Random(0)
+    workload = []
+    for _ in range(args.calls):
+        pick = rng.random()
+        if pick < 0.8:
+            workload.append((user_by_email, f"user{rng.randrange(args.rows)}@example.com"))
+        elif pick < 0.95:
+            workload.append((users_by_age, rng.randint(18, 120)))
+        else:
+            workload.append((oldest_users, 10))
+
+    for phase in ("no index on age", "after CREATE INDEX on age"):
+        slow_log.reset()
+        start = time.perf_counter()
+        for func, arg in workload:
+            func(arg)
+        elapsed = time.perf_counter() - start
+        print(f"== {phase}: {args.calls} calls in {elapsed:.2f}s, threshold "
+              f"{args.threshold * 1e3:g} ms")
+        print(slow_log.format_report(args.top))
+        with pool.connection() as conn:
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_users_age ON users(age)")
+            conn.commit()
+
+    fast = user_by_email.__wrapped__.__wrapped__
+    variants = (("unwatched", db_pool.with_db_connection(pool=pool)(fast)),
+                ("detect_slow_queries", user_by_email))
+    for name, func in variants:
+        start = time.perf_counter()
+        for i in range(args.calls):
+            func(f"user{i % args.rows}@example.com")
+        print(f"{name:>20}: {(time.perf_counter() - start) / args.calls * 1e6:.2f} us/call")
+    pool.close()
+
+
+class FlakyDatabase:
+    """Simulated database that reports 'database is locked' during an outage."""
+
+    def __init__(self, outage_start, outage_end, service_time):
+        self.outage_start = outage_start
+        self.outage_end = outage_end
+        self.service_time = service_time
+        self.lock = threading.Lock()
+        self.calls = self.outage_calls = 0
+
+    def query(self):
+        now = time.monotonic()
+        down = self.outage_start <= now < self.outage_end
+        with self.lock:
+            self.calls += 1
+            self.outage_calls += down
+        if down:
+            raise sqlite3.OperationalError("database is locked")
+        time.sleep(self.service_time)
+        return [(1,)]
+
+
+def bench_retry(args):
+    """retry_on_failure under an injected outage: tail latency and DB load."""
+    retry = importlib.import_module('3-retry_on_failure')
+    logging.getLogger(retry.__name__).setLevel(logging.ERROR)
+    policies = (
+        ("fixed delay (old)", lambda: {'retries': 4, 'delay': args.outage / 4,
+                                       'max_delay': args.outage / 4, 'retry_if': lambda e: True,
+                                       'sleep': lambda _: time.sleep(args.outage / 4)}),
+        ("backoff + jitter", lambda: {'retries': 8, 'delay': 0.05, 'max_delay': args.outage / 2,
+                                      'deadline': args.deadline}),
+        ("+ circuit breaker", lambda: {'retries': 8, 'delay': 0.05, 'max_delay': args.outage / 2,
+                                       'deadline': args.deadline,
+                                       'breaker': retry.CircuitBreaker(5, args.outage / 5)}),
+    )
+    print(f"{args.threads} clients for {args.seconds}s, outage of {args.outage}s after "
+          f"{args.outage_at}s")
+    print(f"{'policy':>18} {'calls':>7} {'failed':>7} {'db load':>8} {'in outage':>10} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, options in policies:
+        start = time.monotonic()
+        db = FlakyDatabase(start + args.outage_at, start + args.outage_at + args.outage,
+                           args.service_time)
+        fetch = retry.retry_on_failure(**options())(db.query)
+        latencies, failures = [], [0]
+
+        def client(i, barrier):
+            barrier.wait()
+            mine = []
+            while time.monotonic() - start < args.seconds:
+                began = time.monotonic()
+                try:
+                    fetch()
+                except Exception:
+                    failures[0] += 1
+                mine.append(time.monotonic() - began)
+                time.sleep(args.think_time)
+            latencies.extend(mine)
+
+        _run_threads(args.threads, client)
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99)]
+        print(f"{name:>18} {len(latencies):>7} {failures[0]:>7} {db.calls:>8} {db.outage_calls:>10} "
+              f"{statistics.median(latencies) * 1e3:>8.2f} {p99 * 1e3:>8.1f} {latencies[-1] * 1e3:>8.1f}")
+
+
+def bench_group(args):
+    """update_user_email: one commit per call vs group commit windows."""
+    transactions = importlib.import_module('2-transactional')
+    update_user_email = transactions.update_user_email
+    rng = random.Random(0)
+    updates = [(rng.randint(1, args.rows), f"new{i}@example.com") for i in range(args.updates)]
+
+    def set_email(conn, user_id, new_email):
+        conn.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
+    print(f"{'mode':>22} {'updates':>8} {'commits':>8} {'updates/sec':>12}")
+    build_users(args.db, args.rows)
+    pool = db_pool.configure(args.db, size=1)
+    calls = min(args.updates, args.baseline_updates)
+    start = time.perf_counter()
+    for user_id, email in updates[:calls]:
+        update_user_email(user_id=user_id, new_email=f"x{email}")
+    rate = calls / (time.perf_counter() - start)
+    pool.close()
+    print(f"{'commit per call':>22} {calls:>8} {calls:>8} {rate:>12.0f}")
+    baseline = rate
+
+    for window in args.windows:
+        build_users(args.db, args.rows)
+        committer = transactions.GroupCommitter(args.db, max_batch=window, max_wait=args.max_wait)
+        update = transactions.group_commit(committer)(set_email)
+        start = time.perf_counter()
+        if args.threads > 1:
+            def worker(i, barrier):
+                barrier.wait()
+                for user_id, email in updates[i::args.threads]:
+                    update(user_id, email)
+            _run_threads(args.threads, worker)
+        else:
+            futures = [update.submit(user_id, email) for user_id, email in updates]
+            for future in futures:
+                future.result()
+        rate = args.updates / (time.perf_counter() - start)
+        committer.close()
+        print(f"{f'group, window {window}':>22} {args.updates:>8} {committer.batches:>8} "
+              f"{rate:>12.0f}  ({rate / baseline:.0f}x)")
+
+
+def python_calls(func, *args):
+    """Number of Python function calls (frames) one call of func makes."""
+    calls = [0]
+
+    def profile(frame, event, arg):
+        if event == 'call':
+            calls[0] += 1
+
+    sys.setprofile(profile)
+    try:
+        func(*args)
+    finally:
+        sys.setprofile(None)
+    return calls[0]
+
+
+def bench_fused(args):
+    """Nested decorator stacks vs one db_operation wrapper."""
+    transactional = importlib.import_module('2-transactional').transactional
+    retry_on_failure = importlib.import_module('3-retry_on_failure').retry_on_failure
+    cache_module = importlib.import_module('4-cache_query')
+    build_users(args.db, args.rows)
+    pool = db_pool.ConnectionPool(args.db, size=1)
+    metrics = query_metrics.QueryMetrics()
+    query = "SELECT * FROM users WHERE id = ?"
+
+    def noop(conn, query, params):
+        return [(1,)]
+
+    def lookup(conn, query, params):
+        return conn.execute(query, params).fetchall()
+
+    def nested(func, retry=False, transaction=False, cache=None, metrics=None):
+        if transaction:
+            func = transactional(func)
+        if retry:
+            func = retry_on_failure(retries=3, delay=0.01)(func)
+        if cache is not None:
+            func = cache_module.cache_query(cache=cache)(func)
+        func = db_pool.with_db_connection(pool=pool)(func)
+        if metrics is not None:
+            func = query_metrics.instrument_queries(metrics=metrics)(func)
+        return func
+
+    def fused(func, retry=False, transaction=False, cache=None, metrics=None):
+        return db_operation.db_operation(func, pool=pool, transaction=transaction,
+                                         retry={'retries': 3, 'delay': 0.01} if retry else None,
+                                         cache=cache, metrics=metrics)
+
+    stacks = (
+        ("connection", {}),
+        ("+ retry + transaction", {'retry': True, 'transaction': True}),
+        ("+ metrics", {'retry': True, 'transaction': True, 'metrics': metrics}),
+        ("+ cache (hits)", {'retry': True, 'transaction': True, 'metrics': metrics,
+                            'cache': 'lru'}),
+    )
+    rng = random.Random(0)
+    ids = [(rng.randint(1, min(args.rows, 1000)),) for _ in range(args.calls)]
+    print(f"{'stack':>22} {'body':>7} {'nested us':>10} {'fused us':>9} "
+          f"{'nested calls':>13} {'fused calls':>12}")
+    for name, options in stacks:
+        for body_name, body in (("no-op", noop), ("lookup", lookup)):
+            row = []
+            calls = []
+            for build in (nested, fused):
+                built_options = dict(options)
+                if built_options.get('cache') == 'lru':
+                    built_options['cache'] = cache_module.LRUCache(max_entries=2000)
+                func = build(body, **built_options)
+                for params in ids[:1000]:  # warm the cache and statement cache
+                    func(query, params)
+                calls.append(python_calls(func, query, ids[0]))
+                start = time.perf_counter()
+                for params in ids:
+                    func(query, params)
+                row.append((time.perf_counter() - start) / args.calls * 1e6)
+            print(f"{name:>22} {body_name:>7} {row[0]:>10.2f} {row[1]:>9.2f} "
+                  f"{calls[0]:>13} {calls[1]:>12}")
+    pool.close()
+
+
+def _lookup_user(conn, query, params):
+    _lookup_user.calls += 1
+    return conn.execute(query, params).fetchall()
+
+
+_lookup_user.calls = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default='benchmark.db', help="scratch SQLite file")
+    parser.add_argument('--rows', type=int, default=100000)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    load = commands.add_parser('load', help=bench_load.__doc__)
+    load.add_argument('--csv', default='benchmark.csv', help="generated CSV path")
+    load.add_argument('--baseline-rows', type=int, default=20000,
+                      help="cap on rows for the slow per-row loader")
+    load.set_defaults(run=bench_load)
+
+    cache = commands.add_parser('cache', help=bench_cache.__doc__)
+    cache.add_argument('--requests', type=int, default=200000)
+    cache.add_argument('--keys', type=int, default=50000, help="distinct ids queried")
+    cache.add_argument('--zipf-s', type=float, default=1.1, help="Zipf skew exponent")
+    cache.add_argument('--max-entries', type=int, default=1000)
+    cache.set_defaults(run=bench_cache)
+
+    invalidation = commands.add_parser('invalidation', help=bench_invalidation.__doc__)
+    invalidation.add_argument('--requests', type=int, default=100000)
+    invalidation.add_argument('--keys', type=int, default=50000, help="distinct ids touched")
+    invalidation.add_argument('--zipf-s', type=float, default=1.1, help="Zipf skew exponent")
+    invalidation.add_argument('--write-ratio', type=float, default=0.05)
+    invalidation.add_argument('--max-entries', type=int, default=10000)
+    invalidation.set_defaults(run=bench_invalidation)
+
+    coalesce = commands.add_parser('coalesce', help=bench_coalesce.__doc__)
+    coalesce.add_argument('--threads', type=int, default=64)
+    coalesce.add_argument('--distinct', type=int, default=16, help="distinct keys requested")
+    coalesce.add_argument('--ttl', type=float, default=0.2, help="TTL for the hot-key phase")
+    coalesce.add_argument('--seconds', type=float, default=3.0, help="length of the hot-key phase")
+    coalesce.set_defaults(run=bench_coalesce)
+
+    pool = commands.add_parser('pool', help=bench_pool.__doc__)
+    pool.add_argument('--calls', type=int, default=100000)
+    pool.add_argument('--threads', type=int, default=8, help="threads (and pool size)")
+    pool.set_defaults(run=bench_pool)
+
+    statements = commands.add_parser('statements', help=bench_statements.__doc__)
+    statements.add_argument('--calls', type=int, default=1000000)
+    statements.add_argument('--baseline-calls', type=int, default=50000,
+                            help="cap on calls for the connect-per-call baseline")
+    statements.set_defaults(run=bench_statements)
+
+    instrument = commands.add_parser('instrument', help=bench_instrument.__doc__)
+    instrument.add_argument('--calls', type=int, default=200000)
+    instrument.set_defaults(run=bench_instrument)
+
+    slow = commands.add_parser('slow', help=bench_slow.__doc__)
+    slow.add_argument('--calls', type=int, default=5000)
+    slow.add_argument('--threshold', type=float, default=0.002, help="seconds")
+    slow.add_argument('--top', type=int, default=5)
+    slow.set_defaults(run=bench_slow)
+
+    retry = commands.add_parser('retry', help=bench_retry.__doc__)
+    retry.add_argument('--threads', type=int, default=32)
+    retry.add_argument('--seconds', type=float, default=4.0)
+    retry.add_argument('--outage-at', type=float, default=1.0, help="seconds into the run")
+    retry.add_argument('--outage', type=float, default=1.0, help="outage length in seconds")
+    retry.add_argument('--deadline', type=float, default=0.5, help="per-call retry budget")
+    retry.add_argument('--service-time', type=float, default=0.001)
+    retry.add_argument('--think-time', type=float, default=0.01)
+    retry.set_defaults(run=bench_retry)
+
+    group = commands.add_parser('group', help=bench_group.__doc__)
+    group.add_argument('--updates', type=int, default=20000)
+    group.add_argument('--baseline-updates', type=int, default=2000,
+                       help="cap on updates for the commit-per-call baseline")
+    group.add_argument('--windows', type=int, nargs='+', default=[1, 8, 64, 512],
+                       help="max calls per group commit")
+    group.add_argument('--max-wait', type=float, default=0.002, help="seconds")
+    group.add_argument('--threads', type=int, default=1,
+                       help="callers; 1 submits from one loop, more call and block")
+    group.set_defaults(run=bench_group)
+
+    fused = commands.add_parser('fused', help=bench_fused.__doc__)
+    fused.add_argument('--calls', type=int, default=200000)
+    fused.set_defaults(run=bench_fused)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
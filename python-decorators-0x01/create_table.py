@@ -1,40 +1,68 @@
-import csv
 import sqlite3
+from itertools import islice
 
-def read_csv_data(filename):
-    data = []
-    with open(filename, mode='r') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            data.append({
-                'name': row['name'],
-                'email': row['email'],
-                'age': row['age']
-            })
-    return data
+from csv_batches import read_csv_batches
 
-def insert_data(connection, filename):
-    data = read_csv_data(filename)
-    for line in data:
-        try:
-            with connection:
-                cursor = connection.cursor()
-                cursor.execute(
-                    "SELECT email FROM users WHERE email=?", (line['email'],))
-                if cursor.fetchone():
-                    print(f"User with email {line['email']} already exists. Skipping.")
-                    continue  # Use continue, not return, to process all rows
+def read_csv_data(filename, batch_size=2048, stats=None):
+    """
+    Stream (name, email, age) rows from the CSV, batch by batch. If
+    `stats` is given it receives read_csv_batches' rows and rejected counts.
+    """
+    for batch in read_csv_batches(filename, batch_size, columns=('name', 'email', 'age'),
+                                  types={'age': int}, stats=stats):
+        yield from zip(batch['name'], batch['email'], batch['age'])
 
-                query = """
-                    INSERT INTO users(name, email, age)
-                    VALUES (?, ?, ?)
-                """
-                cursor.execute(
-                    query,
-                    (line['name'], line['email'], line['age'])
-                )
-        except sqlite3.OperationalError as err:
-            print(f"Error inserting data: {err}")
+def insert_data(connection, filename, batch_size=50000, fast_load=False):
+    """
+    Bulk-load users from the CSV, skipping emails already in the table.
+
+    Rows go in through executemany with INSERT ... ON CONFLICT(email) DO
+    NOTHING, one transaction per batch_size rows, so duplicates cost no
+    extra round trip and there is one commit per batch instead of per row.
+    fast_load=True switches to WAL with synchronous=NORMAL for the load;
+    the previous journal mode and synchronous level are restored afterwards.
+    Returns a summary dict with inserted and skipped (duplicate) counts,
+    failed for rows in batches that could not be written, and rejected
+    for malformed CSV rows.
+    """
+    query = """
+        INSERT INTO users(name, email, age)
+        VALUES (?, ?, ?)
+        ON CONFLICT(email) DO NOTHING
+    """
+    summary = {'inserted': 0, 'skipped': 0, 'failed': 0, 'rejected': 0}
+    stats = {}
+    previous_sync = previous_journal = None
+    if fast_load:
+        (previous_sync,) = connection.execute("PRAGMA synchronous").fetchone()
+        (previous_journal,) = connection.execute("PRAGMA journal_mode").fetchone()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+    try:
+        rows = read_csv_data(filename, stats=stats)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            try:
+                with connection:
+                    before = connection.total_changes
+                    connection.executemany(query, batch)
+                    inserted = connection.total_changes - before
+            except sqlite3.OperationalError as err:
+                print(f"Error inserting data: {err}")
+                summary['failed'] += len(batch)
+                continue
+            summary['inserted'] += inserted
+            summary['skipped'] += len(batch) - inserted
+    finally:
+        summary['rejected'] = stats.get('rejected', 0)
+        if previous_sync is not None:
+            connection.execute(f"PRAGMA synchronous={int(previous_sync)}")
+        if previous_journal is not None and previous_journal.lower() != 'wal':
+            # WAL is stored in the database file; put the old mode back
+            connection.execute(f"PRAGMA journal_mode={previous_journal}")
+    return summary
 
 if __name__ == '__main__':
     con = sqlite3.connect("users.db")
@@ -48,6 +76,8 @@ if __name__ == '__main__':
             age INTEGER NOT NULL
         )
     """)
-    insert_data(con, 'user_data.csv')
+    summary = insert_data(con, 'user_data.csv')
+    print(f"Inserted {summary['inserted']} users, skipped {summary['skipped']} duplicates, "
+          f"{summary['failed']} failed, {summary['rejected']} rejected.")
     con.commit()
     con.close()
@@ -0,0 +1,85 @@
+"""
+Streaming, column-oriented CSV reader for the seed loaders.
+
+read_csv_batches() reads a CSV with a header row in fixed-size batches
+and yields each batch as {column: sequence of values}, transposing rows with
+zip() instead of building a dict per row. Type conversion runs once per
+column per batch with map(); only a batch that fails conversion falls
+back to row-by-row checking so the bad rows can be dropped. Memory is
+bounded by batch_size, not by the file size.
+"""
+import csv
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+
+def _convert_column(values: Sequence[str], convert: Callable[[str], Any]) -> Optional[List[Any]]:
+    try:
+        return list(map(convert, values))
+    except (ValueError, TypeError, ArithmeticError):
+        return None
+
+
+def read_csv_batches(csv_path: str, batch_size: int = 2048,
+                     columns: Optional[Sequence[str]] = None,
+                     types: Optional[Dict[str, Callable[[str], Any]]] = None,
+                     stats: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Sequence[Any]]]:
+    """
+    Yield {column: values} batches of up to batch_size rows from csv_path.
+
+    `columns` selects and orders the columns to return (default: all, in
+    file order). `types` maps column names to converters such as int;
+    rows where a converter raises, or with the wrong number of fields,
+    are skipped and counted as rejected; blank lines are skipped without
+    counting. If `stats` is given it receives rows, rejected and bytes
+    (bytes read so far) counts.
+    """
+    types = types or {}
+    if stats is not None:
+        stats.update(rows=0, rejected=0, bytes=0)
+    with open(csv_path, newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            return
+        selected = list(columns or header)
+        missing = [column for column in selected if column not in header]
+        if missing:
+            raise ValueError(f"{csv_path} has no column(s): {', '.join(missing)}")
+        positions = [header.index(column) for column in selected]
+        width = len(header)
+
+        while True:
+            batch = list(islice(reader, batch_size))
+            if not batch:
+                break
+            # Blank lines are not rows: skip them without counting
+            batch = [row for row in batch if row]
+            if not batch:
+                continue
+            rejected = 0
+            if any(len(row) != width for row in batch):
+                kept = [row for row in batch if len(row) == width]
+                rejected += len(batch) - len(kept)
+                batch = kept
+            transposed = list(zip(*batch)) if batch else [()] * width
+            result = {column: transposed[i] for column, i in zip(selected, positions)}
+
+            for column, convert in types.items():
+                if column not in result:
+                    continue
+                converted = _convert_column(result[column], convert)
+                if converted is None:
+                    # Slow path: find and drop the rows this column rejects
+                    keep = [_convert_column((value,), convert) for value in result[column]]
+                    rejected += sum(1 for k in keep if k is None)
+                    result = {c: [v for v, k in zip(values, keep) if k is not None]
+                              for c, values in result.items()}
+                    converted = [k[0] for k in keep if k is not None]
+                result[column] = converted
+
+            if stats is not None:
+                stats['rows'] += len(result[selected[0]])
+                stats['rejected'] += rejected
+                stats['bytes'] = csvfile.buffer.tell()
+            yield result
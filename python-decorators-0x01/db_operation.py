@@ -0,0 +1,219 @@
+"""
+One decorator for connection, transaction, retry, cache and logging.
+
+    @db_operation(transaction=True, retry={'retries': 5, 'delay': 0.05},
+                  cache=LRUCache(ttl=60), metrics=True)
+    def get_user_by_id(conn, user_id):
+        ...
+
+does what stacking cache_query, with_db_connection, retry_on_failure,
+transactional and instrument_queries does, with the same policies.
+Nested decorators cost one Python frame and closure per layer on every
+call. db_operation instead generates the source of a single wrapper
+containing only the enabled steps and compiles it once, as dataclasses
+does for __init__.
+
+Steps run in this order:
+- cache lookup: a hit returns before a connection is borrowed
+- timing
+- retry loop, containing:
+  - borrow a pooled connection
+  - transaction around func
+- record metrics and cache the result
+
+Each retry borrows a connection again, so an attempt that failed on a
+broken connection is not retried on the same one. The cache key is the
+function and the call's arguments, so functions sharing a cache do not
+see each other's results. The tables a cached result depends on are `tables`
+if given, otherwise those read by the query argument (the `query`
+keyword or the first str argument); a cached function with neither is
+never invalidated by writes.
+"""
+import functools
+import importlib
+import random
+import sqlite3
+import time
+
+import db_pool
+import query_metrics
+import table_versions
+
+_retry = importlib.import_module('3-retry_on_failure')
+_cache = importlib.import_module('4-cache_query')
+
+
+def _source(name, conn, transaction, retry, cache, metrics, log):
+    """Source of the fused wrapper for the enabled steps."""
+    lines = [f"def {name}(*args, **kwargs):"]
+    depth = 1
+
+    def emit(*code):
+        for line in code:
+            lines.append("    " * depth + line)
+
+    if cache or metrics:
+        emit("query = find_query(args, kwargs)")
+    if cache:
+        emit("key = (func, freeze(args), freeze(kwargs))",
+             "found = cache_lookup(key, valid=is_current)",
+             "if found is not None:",
+             "    return found[0][0]",
+             "deps = snapshot(tables if tables is not None else read_tables(query or ''))")
+    if metrics:
+        emit("start = perf_counter()",
+             "try:")
+        depth += 1
+    if retry:
+        emit("attempts = Attempts(*retry_args)",
+             "while True:")
+        depth += 1
+        emit("attempts.before()",
+             "try:")
+        depth += 1
+    emit(f"lender = {conn}",
+         "conn = lender.acquire()",
+         "broken = False",
+         "try:")
+    depth += 1
+    if transaction:
+        emit("tracker = WriteTracker(conn)",
+             "try:",
+             "    result = func(conn, *args, **kwargs)",
+             "    conn.commit()",
+             "except BaseException:",
+             "    conn.rollback()",
+             "    raise",
+             "finally:",
+             "    tracker.stop()",
+             "bump(tracker.tables)")
+    else:
+        emit("result = func(conn, *args, **kwargs)")
+    depth -= 1
+    emit("except BaseException as e:",
+         "    broken = is_broken(e)",
+         "    raise",
+         "finally:",
+         "    lender.release(conn, discard=broken)")
+    if retry:
+        depth -= 1
+        emit("except Exception as e:",
+             "    pause = attempts.failed(e)",
+             "    if pause is None:",
+             "        raise",
+             "    sleep(pause)",
+             "    continue",
+             "except BaseException:",
+             "    attempts.abandoned()",
+             "    raise",
+             "attempts.succeeded()",
+             "break")
+        depth -= 1
+    if metrics:
+        depth -= 1
+        emit("except Exception as e:",
+             "    elapsed = perf_counter() - start",
+             "    if query is not None:",
+             "        record(query, elapsed, 0, True)")
+        if log:
+            emit("    if sink_running() and (log_rate >= 1.0 or rand() < log_rate):",
+                 "        log_call(time(), query, elapsed, 0, e)")
+        emit("    raise",
+             "elapsed = perf_counter() - start",
+             "rows = 0",
+             "if query is not None:",
+             "    rows = count_rows(result)",
+             "    record(query, elapsed, rows)")
+        if log:
+            emit("if sink_running() and (log_rate >= 1.0 or rand() < log_rate):",
+                 "    log_call(time(), query, elapsed, rows, None)")
+    if cache:
+        emit("cache_set(key, (result, deps), sizeof=result_sizeof)")
+    emit("return result")
+    return "\n".join(lines) + "\n"
+
+
+def _is_broken(error):
+    # Same rule as db_pool's lease: non-operational database errors
+    # may leave the connection unusable
+    return isinstance(error, sqlite3.DatabaseError) and not isinstance(
+        error, (sqlite3.OperationalError, sqlite3.IntegrityError))
+
+
+def db_operation(func=None, *, pool=None, transaction=False, retry=None, cache=None,
+                 tables=None, metrics=None, log_rate=0.0):
+    """
+    Decorator lending func a pooled connection, with optional steps:
+
+    transaction  commit on return, roll back on error, and invalidate
+                 cached reads of the tables written (like transactional)
+    retry        dict of retry_on_failure options (retries, delay,
+                 max_delay, deadline, retry_if, breaker, clock, sleep)
+    cache        an LRUCache, or True for cache_query's shared query_cache
+    tables       tables a cached result depends on (default: parsed
+                 from the query argument)
+    metrics      a QueryMetrics, or True for query_metrics.default_metrics
+    log_rate     fraction of calls to log through the query_metrics sink
+    """
+    if func is None:
+        return functools.partial(db_operation, pool=pool, transaction=transaction,
+                                 retry=retry, cache=cache, tables=tables,
+                                 metrics=metrics, log_rate=log_rate)
+    if cache is True:
+        cache = _cache.query_cache
+    if metrics is True or (metrics is None and log_rate > 0):
+        metrics = query_metrics.default_metrics
+    if log_rate > 0:
+        query_metrics.start_log_sink()
+
+    namespace = {
+        'func': func,
+        'pool': pool,
+        'default_pool': db_pool.default_pool,
+        'is_broken': _is_broken,
+        'WriteTracker': table_versions.WriteTracker,
+        'bump': table_versions.bump,
+        'find_query': query_metrics.find_query,
+        'perf_counter': time.perf_counter,
+        'time': time.time,
+    }
+    if retry is not None:
+        options = dict(retries=3, delay=2, max_delay=30.0, deadline=None,
+                       retry_if=_retry.is_retryable, breaker=None, clock=time.monotonic,
+                       sleep=time.sleep)
+        unknown = set(retry) - set(options)
+        if unknown:
+            raise TypeError(f"unknown retry option(s): {', '.join(sorted(unknown))}")
+        options.update(retry)
+        namespace['sleep'] = options.pop('sleep')
+        namespace['Attempts'] = _retry.Attempts
+        namespace['retry_args'] = (options['retries'], options['delay'], options['max_delay'],
+                                   options['deadline'], options['retry_if'],
+                                   options['breaker'], options['clock'])
+    if isinstance(tables, str):
+        raise TypeError("tables must be a sequence of table names, not a str")
+    if cache is not None:
+        namespace.update(cache_lookup=cache.lookup, cache_set=cache.set,
+                         result_sizeof=_cache.result_sizeof(cache),
+                         freeze=_cache.freeze, is_current=_cache.is_current,
+                         snapshot=table_versions.snapshot,
+                         read_tables=table_versions.read_tables,
+                         tables=(tuple(table.lower() for table in tables)
+                                 if tables is not None else None))
+    if metrics is not None:
+        namespace.update(record=metrics.record, count_rows=query_metrics.count_rows)
+    if log_rate > 0:
+        namespace.update(log_rate=log_rate, rand=random.random,
+                         log_call=query_metrics.log_call,
+                         sink_running=query_metrics.log_sink_running)
+
+    name = "wrapper_db_operation"
+    conn = "pool" if pool is not None else "default_pool()"
+    source = _source(name, conn, transaction, retry is not None, cache is not None,
+                     metrics is not None, log_rate > 0)
+    exec(compile(source, f"<db_operation {func.__qualname__}>", "exec"), namespace)
+    wrapper = functools.wraps(func)(namespace[name])
+    wrapper.source = source
+    wrapper.cache = cache
+    wrapper.metrics = metrics
+    return wrapper
@@ -0,0 +1,224 @@
+"""
+Thread-safe SQLite connection pool behind with_db_connection.
+
+    @with_db_connection
+    def get_user_by_id(conn, user_id):
+        ...
+
+The decorated function gets a connection borrowed from the pool and
+returned when it finishes. Uncommitted work is rolled back on return,
+as closing a fresh connection used to do. The default pool opens
+users.db; call configure() before first use to point it elsewhere or
+change its options.
+"""
+import functools
+import sqlite3
+import threading
+import time
+import weakref
+
+from statement_cache import CachingConnection
+
+DATABASE = 'users.db'
+
+
+class ConnectionPool:
+    """
+    Up to `size` connections to `database`, shared between threads.
+
+    A thread gets back the connection it used last when that one is idle,
+    so per-connection state such as the statement cache stays warm.
+    `pragmas` ({name: value}) run once when each connection is opened. A
+    connection that has been idle for more than check_interval seconds
+    is checked with SELECT 1 before reuse and replaced if it fails.
+    Each connection keeps up to statement_cache_size compiled statements.
+    With count_statements=True connections are statement_cache's
+    CachingConnection, and stats() also reports how often statements
+    were reused; the bookkeeping costs a little on every execute().
+    acquire() raises sqlite3.OperationalError when no connection becomes
+    free within `timeout` seconds.
+    """
+
+    def __init__(self, database=DATABASE, size=5, timeout=30.0, pragmas=None,
+                 check_interval=30.0, statement_cache_size=128, count_statements=False,
+                 **connect_kwargs):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = dict(pragmas or {})
+        self.check_interval = check_interval
+        self.connect_kwargs = dict(connect_kwargs)
+        if count_statements:
+            self.connect_kwargs.setdefault('factory', CachingConnection)
+        self.connect_kwargs.setdefault('cached_statements', statement_cache_size)
+        self._connections = weakref.WeakSet()
+        self._idle = []  # (connection, time it was released)
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self.created = 0
+        self.reused = 0
+        self.replaced = 0
+        self.waits = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, check_same_thread=False, **self.connect_kwargs)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        if isinstance(conn, CachingConnection):
+            self._connections.add(conn)
+        return conn
+
+    def _healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _take_idle(self):
+        """Pop this thread's last connection if idle, else the most recent one."""
+        last = getattr(self._local, 'conn', None)
+        for i, (conn, _) in enumerate(self._idle):
+            if conn is last:
+                return self._idle.pop(i)
+        return self._idle.pop()
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("connection pool is closed")
+                if self._idle:
+                    conn, released_at = self._take_idle()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    conn = released_at = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(
+                        f"no pooled connection to {self.database} free after {timeout}s")
+                self.waits += 1
+                self._cond.wait(remaining)
+
+        # Connecting and health checks run outside the lock
+        try:
+            if conn is None:
+                conn = self._connect()
+                self.created += 1
+            elif time.monotonic() - released_at > self.check_interval and not self._healthy(conn):
+                self._discard(conn)
+                conn = self._connect()
+                self.replaced += 1
+            else:
+                self.reused += 1
+        except BaseException:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        self._local.conn = conn
+        return conn
+
+    def release(self, conn, discard=False):
+        """Return conn to the pool, rolling back anything uncommitted."""
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                discard = True
+        with self._cond:
+            if discard or self._closed:
+                self._open -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard or self._closed:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def connection(self):
+        """Context manager lending one connection."""
+        return _Lease(self)
+
+    def close(self):
+        """Close idle connections; borrowed ones are closed as they come back."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = {'open': self._open, 'idle': len(self._idle), 'created': self.created,
+                     'reused': self.reused, 'replaced': self.replaced, 'waits': self.waits}
+        connections = list(self._connections)
+        if connections:
+            stats['statement_hits'] = sum(conn.statement_hits for conn in connections)
+            stats['statement_misses'] = sum(conn.statement_misses for conn in connections)
+        return stats
+
+
+class _Lease:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __enter__(self):
+        self.conn = self.pool.acquire()
+        return self.conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # A connection that raised a non-operational database error may be broken
+        broken = isinstance(exc_val, sqlite3.DatabaseError) and \
+            not isinstance(exc_val, (sqlite3.OperationalError, sqlite3.IntegrityError))
+        self.pool.release(self.conn, discard=broken)
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def default_pool():
+    """The pool with_db_connection uses unless given another one."""
+    global _default_pool
+    if _default_pool is None:
+        with _default_lock:
+            if _default_pool is None:
+                _default_pool = ConnectionPool()
+    return _default_pool
+
+
+def configure(database=DATABASE, **options):
+    """Replace the default pool with ConnectionPool(database, **options)."""
+    global _default_pool
+    with _default_lock:
+        old, _default_pool = _default_pool, ConnectionPool(database, **options)
+    if old is not None:
+        old.close()
+    return _default_pool
+
+
+def with_db_connection(func=None, *, pool=None):
+    """Decorator to lend a pooled connection to func as its first argument."""
+    if func is None:
+        return functools.partial(with_db_connection, pool=pool)
+
+    @functools.wraps(func)
+    def wrapper_with_connection(*args, **kwargs):
+        with (pool or default_pool()).connection() as conn:
+            return func(conn, *args, **kwargs)
+    return wrapper_with_connection
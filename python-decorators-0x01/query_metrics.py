@@ -0,0 +1,303 @@
+"""
+Low-overhead query instrumentation for the decorator toolkit.
+
+    @instrument_queries
+    def fetch_all_users(query):
+        ...
+
+    print(default_metrics.to_prometheus())
+
+Every sampled call records its wall time, the number of rows it returned
+and the normalized SQL fingerprint (literals replaced by ?) into latency
+histograms. Each thread writes to its own histograms, so recording takes
+no locks; exports merge the per-thread copies, and a merge that runs
+during a write may miss that one call. A thread's histograms are folded
+into a shared total when the thread exits. Logged calls only put a tuple
+on a queue; a QueueListener thread formats and writes them, so callers
+never wait on I/O.
+"""
+import atexit
+import functools
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+           1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+# Per-series layout: [count, errors, seconds, rows, bucket counts..., +Inf]
+_COUNT, _ERRORS, _SECONDS, _ROWS, _FIRST_BUCKET = range(5)
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """sql with literals and IN-lists replaced by ?, whitespace collapsed."""
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _IN_LISTS.sub('(?)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _add_series(total, series):
+    for i, value in enumerate(series):
+        total[i] += value
+
+
+class _ThreadToken:
+    """Kept in a thread's local storage; collected when the thread exits."""
+
+    __slots__ = ('__weakref__',)
+
+
+class QueryMetrics:
+    """Per-fingerprint latency histograms, row and error counts."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}  # series of threads that have exited
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = {}
+        token = _ThreadToken()
+        self._local.series = shard
+        self._local.token = token
+        with self._lock:
+            self._shards.append(shard)
+        weakref.finalize(token, self._retire, shard)
+        return shard
+
+    def _retire(self, shard):
+        # The owning thread has exited, so nothing writes to shard any more
+        with self._lock:
+            self._shards = [s for s in self._shards if s is not shard]
+            for key, series in shard.items():
+                total = self._retired.get(key)
+                if total is None:
+                    self._retired[key] = list(series)
+                else:
+                    _add_series(total, series)
+
+    def record(self, sql, seconds, rows=0, error=False):
+        try:
+            shard = self._local.series
+        except AttributeError:
+            shard = self._shard()
+        key = fingerprint(sql)
+        series = shard.get(key)
+        if series is None:
+            series = shard[key] = [0, 0, 0.0, 0] + [0] * (len(self.buckets) + 1)
+        series[_COUNT] += 1
+        series[_ERRORS] += error
+        series[_SECONDS] += seconds
+        series[_ROWS] += rows
+        series[_FIRST_BUCKET + bisect_left(self.buckets, seconds)] += 1
+
+    def snapshot(self):
+        """{fingerprint: {count, errors, seconds, rows, buckets}} over all threads."""
+        with self._lock:
+            shards = list(self._shards)
+            merged = {key: list(series) for key, series in self._retired.items()}
+        for shard in shards:
+            for key, series in list(shard.items()):
+                total = merged.get(key)
+                if total is None:
+                    merged[key] = list(series)
+                else:
+                    _add_series(total, series)
+        return {key: {'count': s[_COUNT], 'errors': s[_ERRORS], 'seconds': s[_SECONDS],
+                      'rows': s[_ROWS], 'buckets': s[_FIRST_BUCKET:]}
+                for key, s in merged.items()}
+
+    def reset(self):
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+            self._retired.clear()
+
+    def to_json(self, indent=None):
+        bounds = [str(b) for b in self.buckets] + ['+Inf']
+        return json.dumps({
+            'buckets': bounds,
+            'queries': [dict(fingerprint=key, **series)
+                        for key, series in sorted(self.snapshot().items())],
+        }, indent=indent)
+
+    def to_prometheus(self, prefix='sql_query'):
+        """Prometheus text exposition format (histogram plus counters)."""
+        lines = [
+            f"# HELP {prefix}_duration_seconds Query wall time.",
+            f"# TYPE {prefix}_duration_seconds histogram",
+        ]
+        rows, errors = [], []
+        for key, series in sorted(self.snapshot().items()):
+            label = 'fingerprint="{}"'.format(
+                key.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series['buckets']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{prefix}_duration_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{prefix}_duration_seconds_sum{{{label}}} {series['seconds']!r}")
+            lines.append(f"{prefix}_duration_seconds_count{{{label}}} {series['count']}")
+            rows.append(f"{prefix}_rows_total{{{label}}} {series['rows']}")
+            errors.append(f"{prefix}_errors_total{{{label}}} {series['errors']}")
+        lines += [f"# HELP {prefix}_rows_total Rows returned.",
+                  f"# TYPE {prefix}_rows_total counter"] + rows
+        lines += [f"# HELP {prefix}_errors_total Queries that raised.",
+                  f"# TYPE {prefix}_errors_total counter"] + errors
+        return "\n".join(lines) + "\n"
+
+
+default_metrics = QueryMetrics()
+
+logger = logging.getLogger('query_metrics')
+_log_queue = queue.SimpleQueue()
+_listener = None
+_listener_lock = threading.Lock()
+
+
+class _QueryLogListener(logging.handlers.QueueListener):
+    """
+    QueueListener fed raw (created, query, seconds, rows, error) tuples;
+    building the LogRecord happens here on the listener thread, not in the
+    caller. query is None for a call without one, and error is the
+    exception a failed call raised.
+    """
+
+    def prepare(self, item):
+        created, query, seconds, rows, error = item
+        level = logging.INFO
+        if query is None:
+            msg, args = "No SQL query provided", ()
+        elif error is not None:
+            level = logging.WARNING
+            msg, args = "Executing SQL Query: %s (%.3f ms, failed: %r)", (query, seconds * 1e3, error)
+        else:
+            msg, args = "Executing SQL Query: %s (%.3f ms, %d rows)", (query, seconds * 1e3, rows)
+        record = logger.makeRecord(logger.name, level, __file__, 0, msg, args, None)
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        return record
+
+
+def start_log_sink(handler=None):
+    """
+    Write logged queries to `handler` (default: stdout, in log_queries'
+    format) from a listener thread. Stopped at exit.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return _listener
+        if handler is None:
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(logging.Formatter(
+                "[%(asctime)s] %(message)s", "%Y-%m-%d %H:%M:%S"))
+        _listener = _QueryLogListener(_log_queue, handler)
+        _listener.start()
+        atexit.register(stop_log_sink)
+        return _listener
+
+
+def stop_log_sink():
+    """Flush and stop the listener thread; later log lines are dropped."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener, listener = None, _listener
+            listener.stop()
+
+
+def log_sink_running():
+    """True while the log sink is started."""
+    return _listener is not None
+
+
+def log_call(created, query, seconds, rows=0, error=None):
+    """
+    Queue one call for the log sink, as instrument_queries does; dropped
+    if the sink is not running. query is None for a call without one.
+    """
+    if _listener is not None:
+        _log_queue.put((created, query, seconds, rows, error))
+
+
+def find_query(args, kwargs):
+    """The `query` keyword or first str argument of a call, or None."""
+    query = kwargs.get('query')
+    if query is None:
+        for arg in args:
+            if isinstance(arg, str):
+                return arg
+    return query
+
+
+def count_rows(result):
+    """Rows in a call's result: its length for a list or tuple, else 0 or 1."""
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    return 0 if result is None else 1
+
+
+def instrument_queries(func=None, *, metrics=None, sample_rate=1.0, log_rate=0.0):
+    """
+    Decorator to time the SQL query the function runs.
+
+    The query is taken from the `query` keyword or the first str argument.
+    sample_rate is the fraction of calls timed and recorded (0 turns
+    recording off); log_rate the fraction of those also logged through
+    the log sink, which is started on first use. Failed calls and calls
+    without a query are logged too.
+    """
+    if func is None:
+        return functools.partial(instrument_queries, metrics=metrics,
+                                 sample_rate=sample_rate, log_rate=log_rate)
+    store = default_metrics if metrics is None else metrics
+    if log_rate > 0:
+        start_log_sink()
+    perf_counter = time.perf_counter
+    rand = random.random
+
+    @functools.wraps(func)
+    def wrapper_instrument(*args, **kwargs):
+        if sample_rate < 1.0 and (sample_rate <= 0.0 or rand() >= sample_rate):
+            return func(*args, **kwargs)
+        start = perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            elapsed = perf_counter() - start
+            query = find_query(args, kwargs)
+            if query is not None:
+                store.record(query, elapsed, 0, True)
+            if log_rate > 0 and _listener is not None and (log_rate >= 1.0 or rand() < log_rate):
+                _log_queue.put((time.time(), query, elapsed, 0, e))
+            raise
+        elapsed = perf_counter() - start
+        query = find_query(args, kwargs)
+        rows = 0
+        if query is not None:
+            rows = count_rows(result)
+            store.record(query, elapsed, rows)
+        if log_rate > 0 and _listener is not None and (log_rate >= 1.0 or rand() < log_rate):
+            _log_queue.put((time.time(), query, elapsed, rows, None))
+        return result
+    wrapper_instrument.metrics = store
+    return wrapper_instrument
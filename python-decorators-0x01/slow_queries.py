@@ -0,0 +1,139 @@
+"""
+Slow-query detection with EXPLAIN QUERY PLAN capture.
+
+    @with_db_connection
+    @detect_slow_queries(threshold=0.05)
+    def get_users_by_age(conn, age):
+        ...
+
+    print(default_slow_log.format_report())
+
+Statements are seen through the connection's trace callback, so any
+function that receives a connection can be watched, whatever SQL it
+runs. A statement is timed from its trace event to the next one, or to
+the function's return, so the time includes Python work between
+statements. Statements over the threshold are aggregated by
+query_metrics fingerprint. The first time a fingerprint is slow, its
+EXPLAIN QUERY PLAN is captured on the same connection and a warning is
+logged; full table scans in the plan are flagged in the report.
+"""
+import functools
+import logging
+import re
+import threading
+import time
+
+import sql_trace
+from query_metrics import fingerprint
+
+logger = logging.getLogger('slow_queries')
+
+_EXPLAINABLE = re.compile(r'^\s*(?:SELECT|WITH|INSERT|REPLACE|UPDATE|DELETE)\b', re.IGNORECASE)
+# SQLite before 3.36 prints "SCAN TABLE users", later versions "SCAN users"
+_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)')
+
+
+class SlowQueryLog:
+    """Slow statements aggregated by fingerprint, with one plan each."""
+
+    def __init__(self, threshold=0.1, explain=True):
+        self.threshold = threshold
+        self.explain = explain
+        self._queries = {}
+        self._lock = threading.Lock()
+
+    def observe(self, conn, sql, seconds, threshold=None):
+        """Record one statement if it took at least threshold seconds."""
+        if seconds < (self.threshold if threshold is None else threshold):
+            return
+        key = fingerprint(sql)
+        with self._lock:
+            entry = self._queries.get(key)
+            first = entry is None
+            if first:
+                entry = self._queries[key] = {
+                    'fingerprint': key, 'count': 0, 'seconds': 0.0, 'max': 0.0,
+                    'example': sql, 'plan': None}
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            if seconds > entry['max']:
+                entry['max'] = seconds
+                entry['example'] = sql
+        if first:
+            if self.explain and conn is not None:
+                entry['plan'] = explain(conn, sql)
+            logger.warning("slow query (%.1f ms): %s", seconds * 1e3, sql)
+
+    def report(self, top=10):
+        """The `top` fingerprints by total slow time, slowest first."""
+        with self._lock:
+            entries = [dict(entry) for entry in self._queries.values()]
+        entries.sort(key=lambda entry: entry['seconds'], reverse=True)
+        for entry in entries[:top]:
+            entry['full_scans'] = full_scans(entry['plan'] or ())
+        return entries[:top]
+
+    def format_report(self, top=10):
+        lines = []
+        for rank, entry in enumerate(self.report(top), 1):
+            lines.append(f"{rank}. {entry['fingerprint']}")
+            lines.append(f"   {entry['count']} slow, {entry['seconds'] * 1e3:.1f} ms total, "
+                         f"{entry['max'] * 1e3:.1f} ms max")
+            for detail in entry['plan'] or ():
+                lines.append(f"   plan: {detail}")
+            for table in entry['full_scans']:
+                lines.append(f"   full scan of {table}: no index used")
+        return "\n".join(lines) if lines else "no slow queries"
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+
+
+def explain(conn, sql):
+    """EXPLAIN QUERY PLAN details for sql, or None if it cannot be explained."""
+    if not _EXPLAINABLE.match(sql):
+        return None
+    try:
+        return [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+    except Exception:
+        # e.g. parameters the trace callback could not expand
+        return None
+
+
+def full_scans(plan):
+    """Tables an EXPLAIN QUERY PLAN reads with a full scan."""
+    return [match.group(1) for match in map(_FULL_SCAN.match, plan) if match]
+
+
+default_slow_log = SlowQueryLog()
+
+
+def detect_slow_queries(func=None, *, threshold=None, log=None):
+    """
+    Decorator to record slow statements run on the connection passed as
+    the first argument (put it under with_db_connection). threshold
+    (seconds) overrides the log's own threshold.
+    """
+    if func is None:
+        return functools.partial(detect_slow_queries, threshold=threshold, log=log)
+    slow_log = default_slow_log if log is None else log
+    perf_counter = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper_detect(conn, *args, **kwargs):
+        started = []  # (start time, sql)
+
+        def trace(sql):
+            started.append((perf_counter(), sql))
+
+        sql_trace.add_listener(conn, trace)
+        try:
+            return func(conn, *args, **kwargs)
+        finally:
+            end = perf_counter()
+            sql_trace.remove_listener(conn, trace)
+            ends = [at for at, _ in started[1:]] + [end]
+            for (start, sql), stop in zip(started, ends):
+                slow_log.observe(conn, sql, stop - start, threshold)
+    return wrapper_detect
@@ -0,0 +1,43 @@
+"""
+Shared sqlite3 trace callback.
+
+A connection has a single trace callback, and there is no way to read
+it back, so two decorators that both call set_trace_callback() would
+cancel each other out. Listeners registered here share one callback
+per connection:
+
+    add_listener(conn, seen.append)
+    ...
+    remove_listener(conn, seen.append)
+"""
+import threading
+
+_listeners = {}  # id(conn) -> [callback, ...]
+_lock = threading.Lock()
+
+
+def add_listener(conn, callback):
+    """Call callback(sql) for every statement conn runs from now on."""
+    with _lock:
+        callbacks = _listeners.get(id(conn))
+        if callbacks is None:
+            callbacks = _listeners[id(conn)] = []
+            install = True
+        else:
+            install = False
+        callbacks.append(callback)
+    if install:
+        conn.set_trace_callback(lambda sql: [listener(sql) for listener in tuple(callbacks)])
+
+
+def remove_listener(conn, callback):
+    """Stop calling callback; the trace callback is cleared with the last one."""
+    with _lock:
+        callbacks = _listeners.get(id(conn))
+        if callbacks is None:
+            return
+        callbacks.remove(callback)
+        if callbacks:
+            return
+        del _listeners[id(conn)]
+    conn.set_trace_callback(None)
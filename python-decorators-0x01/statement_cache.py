@@ -0,0 +1,74 @@
+"""
+Statement cache accounting for pooled SQLite connections.
+
+sqlite3 already keeps up to `cached_statements` compiled statements per
+connection, keyed on the SQL text and evicted least-recently-used, but it
+does not say how often they are reused. CachingConnection mirrors that
+LRU so hits and misses can be counted:
+
+    conn = sqlite3.connect('users.db', factory=CachingConnection,
+                           cached_statements=256)
+    ...
+    conn.statement_stats()
+
+Statements only stay compiled while the connection lives, which is why
+the pool (db_pool) is what makes reuse possible across calls.
+"""
+import sqlite3
+from collections import OrderedDict
+
+
+class CachingConnection(sqlite3.Connection):
+    """sqlite3.Connection that counts statement cache hits and misses."""
+
+    def __init__(self, *args, cached_statements=128, **kwargs):
+        super().__init__(*args, cached_statements=cached_statements, **kwargs)
+        self.statement_capacity = cached_statements
+        self._statements = OrderedDict()
+        self.statement_hits = 0
+        self.statement_misses = 0
+
+    def _track(self, sql):
+        statements = self._statements
+        if sql in statements:
+            statements.move_to_end(sql)
+            self.statement_hits += 1
+            return
+        self.statement_misses += 1
+        if self.statement_capacity > 0:
+            statements[sql] = None
+            if len(statements) > self.statement_capacity:
+                statements.popitem(last=False)
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or CachingCursor)
+
+    def execute(self, sql, parameters=()):
+        self._track(sql)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._track(sql)
+        return super().executemany(sql, seq_of_parameters)
+
+    def statement_stats(self):
+        lookups = self.statement_hits + self.statement_misses
+        return {
+            'statements': len(self._statements),
+            'capacity': self.statement_capacity,
+            'hits': self.statement_hits,
+            'misses': self.statement_misses,
+            'hit_rate': self.statement_hits / lookups if lookups else 0.0,
+        }
+
+
+class CachingCursor(sqlite3.Cursor):
+    """Cursor reporting its statements to a CachingConnection."""
+
+    def execute(self, sql, parameters=()):
+        self.connection._track(sql)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.connection._track(sql)
+        return super().executemany(sql, seq_of_parameters)
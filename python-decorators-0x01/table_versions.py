@@ -0,0 +1,77 @@
+"""
+Per-table generation counters for cache invalidation.
+
+cache_query records the generation of every table a query reads when it
+caches the result; transactional bumps the generation of every table a
+committed transaction wrote. A cached result is only served while all of
+its tables are still at the recorded generation.
+
+Counters live in this process only: writes made by other processes, or
+outside transactional, must call bump() themselves.
+"""
+import re
+import threading
+
+import sql_trace
+
+_versions = {}
+_lock = threading.Lock()
+
+_READ_TABLES = re.compile(r'\b(?:FROM|JOIN)\s+["`\[]?(\w+)', re.IGNORECASE)
+_WRITE_TABLES = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)'
+    r'\s+["`\[]?(\w+)', re.IGNORECASE)
+
+
+def read_tables(sql):
+    """Lower-cased names of the tables `sql` reads (FROM/JOIN targets)."""
+    return frozenset(name.lower() for name in _READ_TABLES.findall(sql))
+
+
+def written_table(sql):
+    """Lower-cased name of the table an INSERT/UPDATE/DELETE writes, or None."""
+    match = _WRITE_TABLES.match(sql)
+    return match.group(1).lower() if match else None
+
+
+def snapshot(tables):
+    """((table, generation), ...) for `tables`, to store beside a cached result."""
+    return tuple((table, _versions.get(table, 0)) for table in tables)
+
+
+def is_current(deps):
+    """True if no table in a snapshot() has been bumped since it was taken."""
+    return all(_versions.get(table, 0) == version for table, version in deps)
+
+
+def bump(tables):
+    """Invalidate cached reads of `tables`."""
+    with _lock:
+        for table in tables:
+            table = table.lower()
+            _versions[table] = _versions.get(table, 0) + 1
+
+
+class WriteTracker:
+    """
+    Collects the tables written through a connection via its trace
+    callback (shared through sql_trace).
+
+        tracker = WriteTracker(conn)
+        ...  # run statements
+        tracker.stop()
+        tracker.tables  # {'users', ...}
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.tables = set()
+        sql_trace.add_listener(conn, self._trace)
+
+    def _trace(self, sql):
+        table = written_table(sql)
+        if table is not None:
+            self.tables.add(table)
+
+    def stop(self):
+        sql_trace.remove_listener(self.conn, self._trace)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Unit tests for write-aware invalidation in cache_query"""
+
+import importlib
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+import table_versions
+
+cache_module = importlib.import_module('4-cache_query')
+transactional_module = importlib.import_module('2-transactional')
+
+
+def read_user(conn, query, params=()):
+    read_user.calls += 1
+    return conn.execute(query, params).fetchall()
+
+
+@transactional_module.transactional
+def set_email(conn, user_id, email):
+    conn.execute("UPDATE users SET email = ? WHERE id = ?", (email, user_id))
+
+
+@transactional_module.transactional
+def failing_update(conn, user_id):
+    conn.execute("UPDATE users SET email = 'lost' WHERE id = ?", (user_id,))
+    raise ValueError("abort")
+
+
+USER_EMAIL = "SELECT email FROM users WHERE id = ?"
+
+
+class TestTableParsing(unittest.TestCase):
+
+    def test_read_tables(self):
+        self.assertEqual(table_versions.read_tables(
+            "SELECT * FROM users u JOIN orders o ON o.user_id = u.id"),
+            {'users', 'orders'})
+        self.assertEqual(table_versions.read_tables('select 1 from "Users"'), {'users'})
+
+    def test_written_table(self):
+        self.assertEqual(table_versions.written_table("UPDATE users SET a = 1"), 'users')
+        self.assertEqual(table_versions.written_table("INSERT OR IGNORE INTO users VALUES (1)"),
+                         'users')
+        self.assertEqual(table_versions.written_table("DELETE FROM orders"), 'orders')
+        self.assertIsNone(table_versions.written_table("SELECT * FROM users"))
+
+
+class TestInvalidation(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY)")
+        conn.executemany("INSERT INTO users VALUES (?, ?)",
+                         ((i, f"user{i}@example.com") for i in range(1, 11)))
+        conn.commit()
+        conn.close()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.cache = cache_module.LRUCache()
+        self.read = cache_module.cache_query(cache=self.cache)(read_user)
+        read_user.calls = 0
+
+    def tearDown(self):
+        self.conn.close()
+        os.remove(self.path)
+
+    def test_write_invalidates_dependent_reads(self):
+        self.assertEqual(self.read(self.conn, USER_EMAIL, (1,)), [("user1@example.com",)])
+        self.read(self.conn, USER_EMAIL, (1,))
+        self.assertEqual(read_user.calls, 1)
+        set_email(self.conn, 1, "new@example.com")
+        self.assertEqual(self.read(self.conn, USER_EMAIL, (1,)), [("new@example.com",)])
+        self.assertEqual(read_user.calls, 2)
+        self.assertEqual(self.cache.invalidations, 1)
+
+    def test_other_tables_stay_cached(self):
+        self.read(self.conn, USER_EMAIL, (1,))
+        with self.conn:
+            self.conn.execute("INSERT INTO orders VALUES (1)")
+        table_versions.bump(['orders'])
+        self.read(self.conn, USER_EMAIL, (1,))
+        self.assertEqual(read_user.calls, 1)
+
+    def test_rollback_does_not_invalidate(self):
+        self.read(self.conn, USER_EMAIL, (2,))
+        with self.assertRaises(ValueError):
+            failing_update(self.conn, 2)
+        self.assertEqual(self.read(self.conn, USER_EMAIL, (2,)), [("user2@example.com",)])
+        self.assertEqual(read_user.calls, 1)
+
+    def test_write_during_read_leaves_entry_stale(self):
+        def read_racing_write(conn, query, params=()):
+            rows = conn.execute(query, params).fetchall()
+            set_email(conn, params[0], "raced@example.com")
+            return rows
+
+        read = cache_module.cache_query(cache=self.cache)(read_racing_write)
+        self.assertEqual(read(self.conn, USER_EMAIL, (3,)), [("user3@example.com",)])
+        self.assertEqual(self.read(self.conn, USER_EMAIL, (3,)), [("raced@example.com",)])
+
+    def test_interleaved_threads_never_read_stale(self):
+        # Emails carry a per-user version: -1 for the seed data, then the
+        # writer's step n. A read must return a version at least as new as
+        # the last write committed before it started, and no newer than the
+        # last write begun before it finished.
+        def version(email):
+            return int(email[1:email.index('@')]) if email.startswith('w') else -1
+
+        committed = dict.fromkeys(range(1, 11), -1)
+        begun = dict(committed)
+        lock = threading.Lock()
+        writing = threading.Event()
+        writing.set()
+        stale = []
+
+        def writer():
+            rng = random.Random(0)
+            conn = sqlite3.connect(self.path, timeout=30)
+            for n in range(200):
+                user_id = rng.randint(1, 10)
+                with lock:
+                    begun[user_id] = n
+                set_email(conn, user_id, f"w{n}@example.com")
+                with lock:
+                    committed[user_id] = n
+                # Leave the readers time to hit the cache between writes
+                time.sleep(0.001)
+            conn.close()
+            writing.clear()
+
+        def reader(seed):
+            rng = random.Random(seed)
+            conn = sqlite3.connect(self.path, timeout=30)
+            # Keep reading for as long as the writer runs
+            while writing.is_set():
+                user_id = rng.randint(1, 10)
+                with lock:
+                    oldest = committed[user_id]
+                rows = self.read(conn, USER_EMAIL, (user_id,))
+                with lock:
+                    newest = begun[user_id]
+                if not oldest <= version(rows[0][0]) <= newest:
+                    stale.append((user_id, oldest, rows, newest))
+                time.sleep(0)  # let the writer run
+            conn.close()
+
+        threads = [threading.Thread(target=writer)] + [
+            threading.Thread(target=reader, args=(seed,)) for seed in range(1, 5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(stale, [])
+        self.assertGreater(self.cache.hits, 0)
+
+if __name__ == "__main__":
+    unittest.main()
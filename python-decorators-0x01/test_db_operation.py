@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Unit tests for the fused wrapper db_operation generates"""
+
+import importlib
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import db_pool
+from db_operation import db_operation
+
+cache_module = importlib.import_module('4-cache_query')
+
+NO_WAIT = {'retries': 3, 'delay': 0, 'sleep': lambda _: None}
+
+
+class TestDbOperation(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, item TEXT)")
+        conn.executemany("INSERT INTO users VALUES (?, ?)",
+                         ((i, f"user{i}@example.com") for i in range(1, 4)))
+        conn.executemany("INSERT INTO orders VALUES (?, ?)",
+                         ((i, f"item{i}") for i in range(1, 4)))
+        conn.commit()
+        conn.close()
+        self.pool = db_pool.ConnectionPool(self.path, size=2)
+        self.cache = cache_module.LRUCache()
+        self.calls = 0
+
+    def tearDown(self):
+        self.pool.close()
+        os.remove(self.path)
+
+    def test_functions_sharing_a_cache_are_isolated(self):
+        @db_operation(pool=self.pool, cache=self.cache, tables=('users',))
+        def get_user(conn, user_id):
+            return conn.execute("SELECT email FROM users WHERE id = ?", (user_id,)).fetchone()
+
+        @db_operation(pool=self.pool, cache=self.cache, tables=('orders',))
+        def get_order(conn, order_id):
+            return conn.execute("SELECT item FROM orders WHERE id = ?", (order_id,)).fetchone()
+
+        self.assertEqual(get_user(1), ("user1@example.com",))
+        self.assertEqual(get_order(1), ("item1",))
+        self.assertEqual(get_user(1), ("user1@example.com",))
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_retry_reruns_the_transaction(self):
+        @db_operation(pool=self.pool, transaction=True, retry=NO_WAIT)
+        def add_order(conn, item):
+            conn.execute("INSERT INTO orders (item) VALUES (?)", (item,))
+            self.calls += 1
+            if self.calls == 1:
+                raise sqlite3.OperationalError("database is locked")
+            return self.calls
+
+        self.assertEqual(add_order("retried"), 2)
+        conn = sqlite3.connect(self.path)
+        (count,) = conn.execute("SELECT COUNT(*) FROM orders WHERE item = 'retried'").fetchone()
+        conn.close()
+        # The first attempt's insert was rolled back
+        self.assertEqual(count, 1)
+
+    def test_fatal_error_is_not_retried(self):
+        @db_operation(pool=self.pool, transaction=True, retry=NO_WAIT)
+        def duplicate(conn):
+            self.calls += 1
+            conn.execute("INSERT INTO users VALUES (1, 'again@example.com')")
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            duplicate()
+        self.assertEqual(self.calls, 1)
+
+    def test_transaction_invalidates_cached_reads(self):
+        @db_operation(pool=self.pool, cache=self.cache)
+        def read(conn, query, params=()):
+            self.calls += 1
+            return conn.execute(query, params).fetchall()
+
+        @db_operation(pool=self.pool, transaction=True)
+        def set_email(conn, user_id, email):
+            conn.execute("UPDATE users SET email = ? WHERE id = ?", (email, user_id))
+
+        query = "SELECT email FROM users WHERE id = ?"
+        self.assertEqual(read(query, (2,)), [("user2@example.com",)])
+        read(query, (2,))
+        self.assertEqual(self.calls, 1)
+        set_email(2, "new@example.com")
+        self.assertEqual(read(query, (2,)), [("new@example.com",)])
+        self.assertEqual(self.calls, 2)
+
+    def test_rolled_back_transaction_keeps_cache(self):
+        @db_operation(pool=self.pool, cache=self.cache, tables=('users',))
+        def get_user(conn, user_id):
+            self.calls += 1
+            return conn.execute("SELECT email FROM users WHERE id = ?", (user_id,)).fetchone()
+
+        @db_operation(pool=self.pool, transaction=True)
+        def failing_update(conn, user_id):
+            conn.execute("UPDATE users SET email = 'lost' WHERE id = ?", (user_id,))
+            raise ValueError("abort")
+
+        get_user(3)
+        with self.assertRaises(ValueError):
+            failing_update(3)
+        self.assertEqual(get_user(3), ("user3@example.com",))
+        self.assertEqual(self.calls, 1)
+
+    def test_tables_match_case_insensitively(self):
+        @db_operation(pool=self.pool, cache=self.cache, tables=('Users',))
+        def get_user(conn, user_id):
+            self.calls += 1
+            return conn.execute("SELECT email FROM users WHERE id = ?", (user_id,)).fetchone()
+
+        @db_operation(pool=self.pool, transaction=True)
+        def set_email(conn, user_id, email):
+            conn.execute("UPDATE users SET email = ? WHERE id = ?", (email, user_id))
+
+        get_user(1)
+        set_email(1, "new@example.com")
+        self.assertEqual(get_user(1), ("new@example.com",))
+        self.assertEqual(self.calls, 2)
+
+    def test_tables_rejects_a_bare_string(self):
+        with self.assertRaises(TypeError):
+            db_operation(lambda conn: None, cache=self.cache, tables='users')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Unit tests for the circuit breaker in retry_on_failure"""
+
+import asyncio
+import importlib
+import sqlite3
+import unittest
+
+retry_module = importlib.import_module('3-retry_on_failure')
+CircuitBreaker = retry_module.CircuitBreaker
+CircuitOpenError = retry_module.CircuitOpenError
+
+LOCKED = sqlite3.OperationalError("database is locked")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0, clock=self.clock)
+
+    def trip(self):
+        for _ in range(3):
+            self.breaker.allow()
+            self.breaker.record_failure()
+
+    def test_opens_after_threshold_failures(self):
+        for _ in range(2):
+            self.breaker.allow()
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.breaker.allow()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+        self.assertEqual(self.breaker.rejected, 1)
+
+    def test_success_resets_failure_count(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_half_open_lets_one_trial_through(self):
+        self.trip()
+        self.clock.now = 10.0
+        self.assertEqual(self.breaker.state, 'half-open')
+        self.assertTrue(self.breaker.allow())
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+
+    def test_trial_success_closes(self):
+        self.trip()
+        self.clock.now = 10.0
+        self.breaker.allow()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertFalse(self.breaker.allow())
+
+    def test_trial_failure_reopens(self):
+        self.trip()
+        self.clock.now = 10.0
+        self.breaker.allow()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.clock.now = 19.0
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+        self.clock.now = 20.0
+        self.assertTrue(self.breaker.allow())
+
+    def test_released_trial_can_be_retaken(self):
+        self.trip()
+        self.clock.now = 10.0
+        self.breaker.allow()
+        self.breaker.release_trial()
+        self.assertEqual(self.breaker.state, 'half-open')
+        self.assertTrue(self.breaker.allow())
+
+
+class TestRetryWithBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0, clock=self.clock)
+        self.retry = retry_module.retry_on_failure(retries=2, delay=0, breaker=self.breaker,
+                                                   clock=self.clock, sleep=lambda _: None)
+
+    def half_open(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 10.0
+
+    def test_retryable_failures_trip_the_breaker(self):
+        @self.retry
+        def locked():
+            raise LOCKED
+
+        with self.assertRaises(sqlite3.OperationalError):
+            locked()
+        self.assertEqual(self.breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError):
+            locked()
+
+    def test_fatal_error_does_not_count(self):
+        @self.retry
+        def broken():
+            raise sqlite3.IntegrityError("UNIQUE constraint failed")
+
+        for _ in range(3):
+            with self.assertRaises(sqlite3.IntegrityError):
+                broken()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_interrupted_trial_releases_slot(self):
+        @self.retry
+        def interrupted():
+            raise KeyboardInterrupt
+
+        self.half_open()
+        with self.assertRaises(KeyboardInterrupt):
+            interrupted()
+        self.assertEqual(self.breaker.state, 'half-open')
+        self.assertTrue(self.breaker.allow())
+
+    def test_cancelled_async_trial_releases_slot(self):
+        @retry_module.async_retry_on_failure(retries=2, delay=0, breaker=self.breaker,
+                                             clock=self.clock)
+        async def hangs():
+            await asyncio.sleep(60)
+
+        self.half_open()
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(asyncio.wait_for(hangs(), timeout=0.01))
+        self.assertEqual(self.breaker.state, 'half-open')
+        self.assertTrue(self.breaker.allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
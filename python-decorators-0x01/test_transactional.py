@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Unit tests for GroupCommitter batching in 2-transactional"""
+
+import importlib
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+transactional_module = importlib.import_module('2-transactional')
+GroupCommitter = transactional_module.GroupCommitter
+
+
+def set_email(conn, user_id, email):
+    conn.execute("UPDATE users SET email = ? WHERE id = ?", (email, user_id))
+    return user_id
+
+
+def set_email_then_fail(conn, user_id, error):
+    set_email(conn, user_id, "lost@example.com")
+    raise error
+
+
+class BrokenEndConnection:
+    """Connection whose COMMIT and ROLLBACK both fail."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, *params):
+        if sql in ("COMMIT", "ROLLBACK"):
+            raise sqlite3.OperationalError(f"{sql} failed")
+        return self._conn.execute(sql, *params)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class TestGroupCommitter(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+        conn.executemany("INSERT INTO users VALUES (?, ?)",
+                         ((i, f"user{i}@example.com") for i in range(1, 6)))
+        conn.commit()
+        conn.close()
+        # A long max_wait so that everything submitted up front is one batch
+        self.committer = GroupCommitter(self.path, max_wait=0.2, timeout=0.1)
+
+    def tearDown(self):
+        self.committer.close()
+        os.remove(self.path)
+
+    def emails(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return dict(conn.execute("SELECT id, email FROM users"))
+        finally:
+            conn.close()
+
+    def test_failed_call_is_rolled_back_alone(self):
+        futures = [
+            self.committer.submit(set_email, 1, "one@example.com"),
+            self.committer.submit(set_email_then_fail, 2, ValueError("bad")),
+            self.committer.submit(set_email, 3, "three@example.com"),
+        ]
+        self.assertEqual(futures[0].result(), 1)
+        with self.assertRaises(ValueError):
+            futures[1].result()
+        self.assertEqual(futures[2].result(), 3)
+        self.assertEqual(self.committer.batches, 1)
+        emails = self.emails()
+        self.assertEqual(emails[1], "one@example.com")
+        self.assertEqual(emails[2], "user2@example.com")
+        self.assertEqual(emails[3], "three@example.com")
+
+    def test_base_exception_fails_only_its_call(self):
+        interrupted = self.committer.submit(set_email_then_fail, 2, KeyboardInterrupt())
+        with self.assertRaises(KeyboardInterrupt):
+            interrupted.result(timeout=5)
+        # The writer thread is still running
+        self.assertEqual(self.committer.submit(set_email, 4, "four@example.com").result(timeout=5), 4)
+        self.assertEqual(self.emails()[2], "user2@example.com")
+
+    def test_commit_failure_reaches_every_call(self):
+        # An open read transaction holds a shared lock, so COMMIT cannot finish
+        reader = sqlite3.connect(self.path, isolation_level=None)
+        reader.execute("BEGIN")
+        reader.execute("SELECT * FROM users").fetchall()
+        try:
+            futures = [self.committer.submit(set_email, i, f"new{i}@example.com")
+                       for i in (1, 2)]
+            for future in futures:
+                with self.assertRaises(sqlite3.OperationalError):
+                    future.result(timeout=5)
+        finally:
+            reader.execute("COMMIT")
+            reader.close()
+        self.assertEqual(self.emails()[1], "user1@example.com")
+        self.assertEqual(self.committer.batches, 0)
+
+    def test_failed_rollback_still_resolves_every_call(self):
+        self.committer._conn = BrokenEndConnection(self.committer._conn)
+        with mock.patch.object(threading, 'excepthook') as excepthook:
+            futures = [self.committer.submit(set_email, i, f"new{i}@example.com")
+                       for i in (1, 2)]
+            for future in futures:
+                with self.assertRaisesRegex(sqlite3.OperationalError, "COMMIT failed"):
+                    future.result(timeout=5)
+            # The connection's state is unknown, so the writer stops
+            self.committer._thread.join(timeout=5)
+        self.assertIn("ROLLBACK failed", str(excepthook.call_args[0][0].exc_value))
+        with self.assertRaises(RuntimeError):
+            self.committer.submit(set_email, 1, "late@example.com")
+
+    def test_submit_after_close_raises(self):
+        self.committer.close()
+        with self.assertRaises(RuntimeError):
+            self.committer.submit(set_email, 1, "late@example.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,23 @@
 #!/usr/bin/python3
 
+import argparse
 import sys
 import os
 
 import seed
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create and seed the ALX_prodev database.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="parallel CSV parser/writer count (default: 1, sequential)")
+    parser.add_argument('--sqlite', nargs='?', const=seed.SQLITE_COPY, metavar='PATH',
+                        help="also copy user_data to a SQLite file for async_streams "
+                             f"(default path: {seed.SQLITE_COPY})")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+
     # Step 1: Connect to MySQL (no DB selected)
     connection = seed.connect_db()
     if not connection:
@@ -25,6 +37,7 @@ def main():
 
     # Step 4: Create table if needed
     seed.create_table(connection)
+    seed.add_sequence_column(connection)
 
     # Step 5: Insert data from CSV
     csv_path = 'user_data.csv'
@@ -32,7 +45,14 @@ def main():
         print(f"CSV file {csv_path} not found.", file=sys.stderr)
         connection.close()
         sys.exit(1)
-    seed.insert_data(connection, csv_path)
+    if args.workers > 1:
+        seed.insert_data_parallel(csv_path, workers=args.workers)
+    else:
+        seed.insert_data(connection, csv_path)
+
+    if args.sqlite:
+        copied = seed.export_sqlite(connection, args.sqlite)
+        print(f"Copied {copied} rows to {args.sqlite}")
 
     # Step 6: Validate schema and print sample data
     cursor = connection.cursor()
@@ -45,7 +65,7 @@ def main():
         if result:
             print("Database ALX_prodev is present ")
 
-        cursor.execute(f"SELECT * FROM {seed.TABLE_NAME} LIMIT 5;")
+        cursor.execute(f"SELECT user_id, name, email, age FROM {seed.TABLE_NAME} LIMIT 5;")
         rows = cursor.fetchall()
         print(rows)
     finally:
@@ -1,26 +1,52 @@
 import mysql.connector
 from mysql.connector import Error
 
-def stream_users():
+rows = __import__('rows')
+
+def stream_users(fetch_size=1000, buffered=False, connection=None, row_format='dict'):
     """
     Generator that yields one row at a time from the user_data table in ALX_prodev.
     Each row is yielded as a dict with keys: user_id, name, email, age.
+
+    By default the cursor is unbuffered: rows stay on the server and are
+    pulled fetch_size at a time, so first-row latency and client memory do
+    not grow with the table. buffered=True restores the old behaviour of
+    reading the whole result set before the first row is yielded.
+    If `connection` is given it is used and left open.
+
+    row_format='tuple' yields plain (user_id, name, email, age) tuples and
+    row_format='record' yields rows.UserRecord objects, skipping the
+    per-row dict for consumers that only read a column or two.
     """
-    connection = None
+    rows.check_format(row_format)
+    own_connection = connection is None
     cursor = None
+    exhausted = False
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',  # Parameterize or secure in production
-            database='ALX_prodev'
-        )
-        cursor = connection.cursor(dictionary=True)
+        if own_connection:
+            connection = mysql.connector.connect(
+                host='localhost',
+                user='root',
+                password='',  # Parameterize or secure in production
+                database='ALX_prodev'
+            )
+        cursor = rows.open_cursor(connection, row_format, buffered=buffered)
         cursor.execute("SELECT user_id, name, email, age FROM user_data")
-        for row in cursor:
-            yield row
+        while True:
+            batch = cursor.fetchmany(fetch_size)
+            if not batch:
+                break
+            yield from rows.convert_batch(batch, row_format)
+        exhausted = True
     finally:
-        if cursor is not None:
+        if not exhausted and not buffered and connection is not None:
+            if own_connection:
+                # Drop the socket rather than draining the unread rows
+                connection.shutdown()
+                connection = None
+            elif cursor is not None:
+                connection.consume_results()
+        if cursor is not None and connection is not None:
             cursor.close()
-        if connection is not None:
+        if own_connection and connection is not None:
             connection.close()
@@ -1,41 +1,197 @@
+import queue
+import threading
+import time
 import mysql.connector
 from mysql.connector import Error
-from typing import Iterator, List, Dict, Any
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Sequence
 
-def stream_users_in_batches(batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+rows = __import__('rows')
+predicates = __import__('predicates')
+
+def stream_users_in_batches(batch_size: int, row_format: str = 'dict',
+                            connection=None, where=None,
+                            columns: Optional[Sequence[str]] = None,
+                            stats: Optional[Dict[str, int]] = None,
+                            prefetch_depth: int = 0) -> Iterator[Any]:
     """
     Generator that yields batches of users from the user_data table.
     Each batch is a list of dicts, each dict represents a user.
+
+    row_format='tuple' or 'record' yields lists of tuples or
+    rows.UserRecord objects instead; row_format='columns' yields each
+    batch as a dict of column name -> tuple of values.
+    If `connection` is given it is used and left open.
+
+    `columns` restricts the selected columns and `where` takes a
+    predicates.Predicate; the parts of it that compile to SQL are pushed
+    into the query and the rest is applied to the fetched rows. If `stats`
+    is given it receives fetched, pruned_client and (once the scan
+    completes, at the cost of a COUNT(*)) pruned_server row counts.
+
+    prefetch_depth > 0 fetches that many batches ahead on a background
+    thread (see prefetch()); its idle-time counters go into `stats` too.
     """
-    connection = None
+    if prefetch_depth:
+        yield from prefetch(stream_users_in_batches(batch_size, row_format, connection,
+                                                    where, columns, stats),
+                            depth=prefetch_depth, stats=stats)
+        return
+    rows.check_format(row_format, rows.BATCH_FORMATS)
+    columns = tuple(columns or rows.USER_COLUMNS)
+    for column in columns:
+        if column not in rows.USER_COLUMNS:
+            raise ValueError(f"Unknown column: {column}")
+    if row_format == 'record' and columns != rows.USER_COLUMNS:
+        raise ValueError("row_format='record' needs every user column")
+
+    pushed, residual = predicates.split(where)
+    # Columns the client-side filter reads but the caller did not ask for
+    extra = tuple(dict.fromkeys(
+        c for c in (residual.columns() if residual else []) if c not in columns))
+    fetch_columns = columns + extra
+    query = f"SELECT {', '.join(fetch_columns)} FROM user_data"
+    params = []
+    if pushed is not None:
+        query += f" WHERE {pushed[0]}"
+        params = pushed[1]
+    get = predicates.getter(row_format, fetch_columns)
+    if stats is not None:
+        stats.update(fetched=0, pruned_client=0)
+
+    own_connection = connection is None
     cursor = None
+    exhausted = False
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',  # Parameterize or secure in production
-            database='ALX_prodev'
-        )
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT user_id, name, email, age FROM user_data")
+        if own_connection:
+            connection = mysql.connector.connect(
+                host='localhost',
+                user='root',
+                password='',  # Parameterize or secure in production
+                database='ALX_prodev'
+            )
+        cursor = rows.open_cursor(connection, row_format)
+        cursor.execute(query, params)
         while True:
             batch = cursor.fetchmany(batch_size)
             if not batch:
                 break
+            fetched = len(batch)
+            if row_format == 'record':
+                batch = rows.convert_batch(batch, row_format)
+            if residual is not None:
+                batch = [row for row in batch if residual.evaluate(row, get)]
+            if stats is not None:
+                stats['fetched'] += fetched
+                stats['pruned_client'] += fetched - len(batch)
+            if extra:
+                if row_format == 'dict':
+                    batch = [{c: row[c] for c in columns} for row in batch]
+                else:
+                    batch = [row[:len(columns)] for row in batch]
+            if not batch:
+                continue
+            if row_format != 'record':
+                batch = rows.convert_batch(batch, row_format, columns)
             yield batch
+        exhausted = True
+        if stats is not None:
+            cursor.close()
+            cursor = connection.cursor()
+            cursor.execute("SELECT COUNT(*) FROM user_data")
+            (total,) = cursor.fetchone()
+            stats['pruned_server'] = total - stats['fetched']
     finally:
-        if cursor is not None:
+        # Closing a cursor with unread rows raises, so an early stop (e.g.
+        # prefetch() closing this generator) has to deal with them first
+        if not exhausted and connection is not None and cursor is not None:
+            if own_connection:
+                # Drop the socket rather than draining the unread rows
+                connection.shutdown()
+                connection = None
+            else:
+                connection.consume_results()
+        if cursor is not None and connection is not None:
             cursor.close()
-        if connection is not None:
+        if own_connection and connection is not None:
             connection.close()
 
+_DONE = object()
+
+def prefetch(batches: Iterable[Any], depth: int = 1,
+             stats: Optional[Dict[str, float]] = None) -> Iterator[Any]:
+    """
+    Pull items from `batches` on a background thread, keeping up to `depth`
+    of them queued, so fetching batch N+1 overlaps with the caller's work
+    on batch N. The bounded queue stops the fetcher from running ahead.
+
+    Closing the generator stops the fetcher and closes `batches`. If
+    `stats` is given it receives the seconds each side spent idle:
+    producer_wait (queue full, caller is the bottleneck) and
+    consumer_wait (queue empty, the database is the bottleneck).
+    """
+    if depth < 1:
+        raise ValueError("depth must be a positive integer")
+    if stats is None:
+        stats = {}
+    stats.update(producer_wait=0.0, consumer_wait=0.0, batches=0)
+    buffer: "queue.Queue[Any]" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        started = time.perf_counter()
+        try:
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.05)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            stats['producer_wait'] += time.perf_counter() - started
+
+    def produce() -> None:
+        source = iter(batches)
+        try:
+            for batch in source:
+                if not put(batch):
+                    break
+            else:
+                put(_DONE)
+        except BaseException as e:
+            put(e)
+        finally:
+            # The generator must be finalised on the thread that drove it
+            close = getattr(source, 'close', None)
+            if close is not None:
+                close()
+
+    fetcher = threading.Thread(target=produce, daemon=True)
+    fetcher.start()
+    try:
+        while True:
+            started = time.perf_counter()
+            item = buffer.get()
+            stats['consumer_wait'] += time.perf_counter() - started
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            stats['batches'] += 1
+            yield item
+    finally:
+        stop.set()
+        fetcher.join()
+
 def batch_processing(batch_size: int):
     """
     Processes batches of users, filtering users over the age of 25.
     Prints each user as a dict.
+
+    The age filter runs in SQL, so younger users never leave the database.
     """
-    for batch in stream_users_in_batches(batch_size):
+    over_25 = predicates.col('age') > 25
+    for batch in stream_users_in_batches(batch_size, where=over_25):
         for user in batch:
-            if user['age'] > 25:
-                yield user
-        return
+            yield user
+    return
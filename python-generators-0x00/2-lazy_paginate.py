@@ -1,23 +1,175 @@
+import base64
+import json
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
 seed = __import__('seed')
 
-def paginate_users(page_size, offset):
-    connection = seed.connect_to_prodev()
+USER_COLUMNS = ('user_id', 'name', 'email', 'age')
+KEYSET_ORDER = ('user_id',)
+# Explicit columns: user_data also has the internal `seq` column
+SELECT_USERS = f"SELECT {', '.join(USER_COLUMNS)} FROM user_data"
+OFFSET_QUERY = f"{SELECT_USERS} LIMIT %s OFFSET %s"
+
+
+def paginate_users(page_size, offset, connection=None):
+    """
+    Fetch one page of users by OFFSET. Uses `connection` if given (and
+    leaves it open), otherwise opens and closes a connection of its own.
+    """
+    own_connection = connection is None
+    if own_connection:
+        connection = seed.connect_to_prodev()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(OFFSET_QUERY, (page_size, offset))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        if own_connection:
+            connection.close()
+
+
+def _unique_order(order_by: Sequence[str]) -> Sequence[str]:
+    """
+    `order_by` with user_id appended as a tiebreaker. Seeking past a key
+    that other rows share would skip those rows, so the ordering must be
+    unique.
+    """
+    for column in order_by:
+        if column not in USER_COLUMNS:
+            raise ValueError(f"Cannot paginate on unknown column: {column}")
+    order_by = tuple(order_by)
+    return order_by if 'user_id' in order_by else order_by + ('user_id',)
+
+
+def _keyset_query(order_by: Sequence[str], seek: bool) -> str:
+    """Build the seek query for a keyset page ordered by `order_by`."""
+    order_by = _unique_order(order_by)
+    columns = ", ".join(order_by)
+    where = ""
+    if seek:
+        placeholders = ", ".join(["%s"] * len(order_by))
+        # Row-value comparison keeps composite orderings index-friendly
+        where = f"WHERE ({columns}) > ({placeholders}) "
+    return f"{SELECT_USERS} {where}ORDER BY {columns} LIMIT %s"
+
+
+def paginate_users_after(page_size: int, after: Optional[Sequence[Any]] = None,
+                         order_by: Sequence[str] = KEYSET_ORDER,
+                         connection=None) -> List[Dict[str, Any]]:
+    """
+    Fetch the page of users that sorts immediately after the key `after`.
+    Seeks on the index instead of scanning and discarding OFFSET rows, so
+    every page costs the same no matter how deep into the table it is.
+    user_id is appended to `order_by` if missing, and `after` must hold a
+    value for every column of that ordering.
+    """
+    if after is not None and len(after) != len(_unique_order(order_by)):
+        raise ValueError("Seek key does not match the pagination ordering")
+    own_connection = connection is None
+    if own_connection:
+        connection = seed.connect_to_prodev()
     cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
-    rows = cursor.fetchall()
-    connection.close()
-    return rows
+    params = (*after, page_size) if after is not None else (page_size,)
+    try:
+        cursor.execute(_keyset_query(order_by, after is not None), params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        if own_connection:
+            connection.close()
+
+
+class _PageReader:
+    """Runs page queries on one connection, preparing each statement once."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursors = {}
+
+    def fetch(self, query: str, params: Sequence[Any]) -> List[Dict[str, Any]]:
+        cursor = self._cursors.get(query)
+        if cursor is None:
+            # A prepared cursor re-executes its statement server-side
+            # without re-parsing it as long as the SQL text is unchanged.
+            cursor = self._cursors[query] = self.connection.cursor(prepared=True)
+        cursor.execute(query, params)
+        columns = cursor.column_names
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def close(self) -> None:
+        for cursor in self._cursors.values():
+            cursor.close()
+        self._cursors.clear()
+        self.connection.close()
+
+
+def encode_cursor(row: Dict[str, Any], order_by: Sequence[str] = KEYSET_ORDER) -> str:
+    """Return an opaque token that resumes pagination right after `row`."""
+    order_by = _unique_order(order_by)
+    key = [str(row[column]) for column in order_by]
+    payload = json.dumps({"order_by": list(order_by), "key": key})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
 
-def lazy_pagination(page_size):
+
+def decode_cursor(token: str, order_by: Sequence[str] = KEYSET_ORDER) -> List[str]:
+    """Decode a token produced by encode_cursor back into its key values."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid pagination cursor: {token!r}") from e
+    if payload.get("order_by") != list(_unique_order(order_by)):
+        raise ValueError("Pagination cursor was issued for a different ordering")
+    return payload["key"]
+
+
+def page_cursor(page: List[Dict[str, Any]], order_by: Sequence[str] = KEYSET_ORDER) -> Optional[str]:
+    """Token for the page following `page`, or None if `page` is empty."""
+    return encode_cursor(page[-1], order_by) if page else None
+
+
+def lazy_pagination(page_size, mode: str = "offset", cursor: Optional[str] = None,
+                    order_by: Sequence[str] = KEYSET_ORDER,
+                    stats: Optional[Dict[str, int]] = None) -> Iterator[List[Dict[str, Any]]]:
     """
     Generator that lazily paginates over user_data table.
     Yields each page (list of users) of size page_size using only a single loop.
+
+    mode="keyset" seeks on `order_by` (with user_id as a tiebreaker)
+    instead of using OFFSET; pass the token from page_cursor() as
+    `cursor` to resume after a given page (keyset mode only).
+    One connection is held for the whole crawl and closed when the
+    generator is exhausted, closed or garbage-collected. If `stats` is
+    given, `connections_opened` and `pages` are counted into it.
     """
+    if mode not in ("offset", "keyset"):
+        raise ValueError(f"Unknown pagination mode: {mode}")
+    if cursor is not None and mode != "keyset":
+        # An offset crawl would ignore the token and restart from row 0
+        raise ValueError("A pagination cursor can only resume mode='keyset'")
+    if stats is None:
+        stats = {}
+    stats.setdefault("connections_opened", 0)
+    stats.setdefault("pages", 0)
+    order_by = _unique_order(order_by)
     offset = 0
-    while True:
-        page = paginate_users(page_size, offset)
-        if not page:
-            break
-        yield page
-        offset += page_size
-    return  
+    after = decode_cursor(cursor, order_by) if cursor is not None else None
+
+    reader = _PageReader(seed.connect_to_prodev())
+    stats["connections_opened"] += 1
+    try:
+        while True:
+            if mode == "keyset":
+                params = (*after, page_size) if after is not None else (page_size,)
+                page = reader.fetch(_keyset_query(order_by, after is not None), params)
+            else:
+                page = reader.fetch(OFFSET_QUERY, (page_size, offset))
+            if not page:
+                break
+            stats["pages"] += 1
+            yield page
+            offset += page_size
+            after = [page[-1][column] for column in order_by]
+    finally:
+        reader.close()
+    return
@@ -1,18 +1,20 @@
 import mysql.connector
 
-def stream_user_ages():
+def stream_user_ages(connection=None):
     """
     Generator that yields each user's age from the user_data table, one at a time.
+    If `connection` is given it is used and left open.
     """
-    connection = None
+    own_connection = connection is None
     cursor = None
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',  # Use secure password management in production
-            database='ALX_prodev'
-        )
+        if own_connection:
+            connection = mysql.connector.connect(
+                host='localhost',
+                user='root',
+                password='',  # Use secure password management in production
+                database='ALX_prodev'
+            )
         cursor = connection.cursor()
         cursor.execute("SELECT age FROM user_data")
         for (age,) in cursor:
@@ -20,13 +22,14 @@ def stream_user_ages():
     finally:
         if cursor is not None:
             cursor.close()
-        if connection is not None:
+        if own_connection and connection is not None:
             connection.close()
 
 def average_user_age():
     """
     Consumes the stream_user_ages generator and computes the average age.
     Prints result in the specified format.
+    See age_stats.py for batched, vectorised aggregation.
     """
     total = 0
     count = 0
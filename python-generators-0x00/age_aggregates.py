@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+"""
+Incremental, resumable age aggregates over user_data.
+
+An AgeAggregate holds running count/sum/min/max, an exact age histogram
+(ages are small integers, so the histogram doubles as a mergeable
+quantile sketch) and the highest `seq` folded in so far. refresh() loads
+the last checkpoint, streams only rows with a larger `seq` and saves the
+result, so repeated runs cost O(new rows) instead of a full scan.
+Aggregates over disjoint seq ranges can be computed by parallel workers
+with scan_range() and combined with merge().
+
+    ./age_aggregates.py [checkpoint.json]
+"""
+import json
+import math
+import os
+import sys
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+CHECKPOINT_PATH = "age_aggregates.json"
+
+
+class AgeAggregate:
+    """Mergeable summary of the ages of the users with seq <= high_water."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+        self.histogram: Dict[int, int] = {}
+        self.high_water = 0
+
+    def update(self, rows: Iterable[Tuple[int, Any]]) -> "AgeAggregate":
+        """Fold in (seq, age) rows; returns self for chaining."""
+        histogram = self.histogram
+        for seq, age in rows:
+            age = int(age)
+            histogram[age] = histogram.get(age, 0) + 1
+            self.count += 1
+            self.total += age
+            if self.min is None or age < self.min:
+                self.min = age
+            if self.max is None or age > self.max:
+                self.max = age
+            if seq > self.high_water:
+                self.high_water = seq
+        return self
+
+    def merge(self, other: "AgeAggregate") -> "AgeAggregate":
+        """New aggregate covering the rows of both self and other."""
+        merged = AgeAggregate()
+        merged.count = self.count + other.count
+        merged.total = self.total + other.total
+        mins = [v for v in (self.min, other.min) if v is not None]
+        maxes = [v for v in (self.max, other.max) if v is not None]
+        merged.min = min(mins) if mins else None
+        merged.max = max(maxes) if maxes else None
+        merged.histogram = dict(self.histogram)
+        for age, n in other.histogram.items():
+            merged.histogram[age] = merged.histogram.get(age, 0) + n
+        merged.high_water = max(self.high_water, other.high_water)
+        return merged
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q: float) -> Optional[int]:
+        """Nearest-rank q-th percentile (0 < q <= 100) of the ages."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for age in sorted(self.histogram):
+            seen += self.histogram[age]
+            if seen >= rank:
+                return age
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "histogram": {str(age): n for age, n in sorted(self.histogram.items())},
+            "high_water": self.high_water,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AgeAggregate":
+        aggregate = cls()
+        aggregate.count = data["count"]
+        aggregate.total = data["total"]
+        aggregate.min = data["min"]
+        aggregate.max = data["max"]
+        aggregate.histogram = {int(age): n for age, n in data["histogram"].items()}
+        aggregate.high_water = data["high_water"]
+        return aggregate
+
+
+def load_checkpoint(path: str = CHECKPOINT_PATH) -> AgeAggregate:
+    """Last saved aggregate, or an empty one if there is no checkpoint yet."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return AgeAggregate.from_dict(json.load(f))
+    except FileNotFoundError:
+        return AgeAggregate()
+
+
+def save_checkpoint(aggregate: AgeAggregate, path: str = CHECKPOINT_PATH) -> None:
+    """Atomically replace the checkpoint at `path`."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(aggregate.to_dict(), f)
+    os.replace(tmp_path, path)
+
+
+def scan_range(connection, after: int = 0, upto: Optional[int] = None,
+               fetch_size: int = 10000) -> AgeAggregate:
+    """Aggregate the users with after < seq <= upto (no upper bound if None)."""
+    query = "SELECT seq, age FROM user_data WHERE seq > %s"
+    params = [after]
+    if upto is not None:
+        query += " AND seq <= %s"
+        params.append(upto)
+    aggregate = AgeAggregate()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        while True:
+            batch = cursor.fetchmany(fetch_size)
+            if not batch:
+                break
+            aggregate.update(batch)
+    finally:
+        cursor.close()
+    return aggregate
+
+
+def refresh(connection, path: str = CHECKPOINT_PATH, fetch_size: int = 10000) -> AgeAggregate:
+    """
+    Bring the checkpoint at `path` up to date with rows added since it was
+    written, save it and return it.
+
+    InnoDB hands out AUTO_INCREMENT values before commit, so a transaction
+    still in flight during a refresh can later commit rows below the new
+    high-water mark; run refreshes after writers have settled or recompute.
+    """
+    checkpoint = load_checkpoint(path)
+    delta = scan_range(connection, after=checkpoint.high_water, fetch_size=fetch_size)
+    aggregate = checkpoint.merge(delta)
+    save_checkpoint(aggregate, path)
+    return aggregate
+
+
+if __name__ == "__main__":
+    seed = __import__('seed')
+    connection = seed.connect_to_prodev()
+    if not connection:
+        sys.exit(1)
+    try:
+        result = refresh(connection, *sys.argv[1:2])
+    finally:
+        connection.close()
+    print(f"Users: {result.count} (through seq {result.high_water})")
+    print(f"Average age of users: {result.mean}")
+    print(f"Min age: {result.min}  Max age: {result.max}  Median: {result.quantile(50)}")
@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+"""
+Batch-oriented age statistics over user_data.
+
+Ages are pulled in large fetchmany() batches into a flat array('q')
+buffer and summarised with whole-array operations (NumPy when it is
+installed, C-level builtins otherwise), or aggregated entirely in SQL:
+
+    ./age_stats.py --percentiles 50 90 99 --bins 10
+    ./age_stats.py --sql
+"""
+import argparse
+import bisect
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure-Python path is exact too
+    np = None
+
+seed = __import__('seed')
+
+AGE_QUERY = f"SELECT CAST(age AS SIGNED) FROM {seed.TABLE_NAME}"
+
+
+def load_ages(connection, fetch_size: int = 50000) -> array:
+    """Read every age into a contiguous array of 64-bit ints."""
+    ages = array('q')
+    cursor = connection.cursor()
+    try:
+        cursor.execute(AGE_QUERY)
+        while True:
+            batch = cursor.fetchmany(fetch_size)
+            if not batch:
+                break
+            ages.extend(age for (age,) in batch)
+    finally:
+        cursor.close()
+    return ages
+
+
+def _percentile(ordered: Sequence[int], q: float) -> float:
+    """Linear-interpolated percentile of sorted data (NumPy's default)."""
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(ages: array, percentiles: Sequence[float] = (50, 90, 99),
+              bins: int = 10) -> Dict[str, Any]:
+    """
+    count, mean, min, max, the requested percentiles and an equal-width
+    histogram (`bins` counts plus bins + 1 edges) of `ages`.
+    """
+    count = len(ages)
+    if not count:
+        return {"count": 0, "mean": None, "min": None, "max": None,
+                "percentiles": {}, "histogram": {"counts": [], "edges": []}}
+    if np is not None:
+        values = np.frombuffer(ages, dtype=np.int64)
+        counts, edges = np.histogram(values, bins=bins)
+        return {
+            "count": count,
+            "mean": float(values.mean()),
+            "min": int(values.min()),
+            "max": int(values.max()),
+            "percentiles": {q: float(p) for q, p in
+                            zip(percentiles, np.percentile(values, percentiles))},
+            "histogram": {"counts": counts.tolist(), "edges": edges.tolist()},
+        }
+
+    ordered = sorted(ages)
+    low, high = ordered[0], ordered[-1]
+    width = (high - low) / bins
+    edges = [low + width * i for i in range(bins)] + [high]
+    # Bin i holds edges[i] <= age < edges[i + 1]; the last bin is closed
+    cuts = [bisect.bisect_left(ordered, edge) for edge in edges[1:-1]]
+    bounds = [0] + cuts + [count]
+    return {
+        "count": count,
+        "mean": sum(ordered) / count,
+        "min": low,
+        "max": high,
+        "percentiles": {q: float(_percentile(ordered, q)) for q in percentiles},
+        "histogram": {"counts": [b - a for a, b in zip(bounds, bounds[1:])],
+                      "edges": [float(edge) for edge in edges]},
+    }
+
+
+def sql_summary(connection) -> Dict[str, Any]:
+    """count, mean, min and max computed by the database in one pass."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*), AVG(age), MIN(age), MAX(age) FROM {seed.TABLE_NAME}")
+        count, mean, low, high = cursor.fetchone()
+    finally:
+        cursor.close()
+    return {"count": count, "mean": float(mean) if count else None,
+            "min": low, "max": high}
+
+
+def age_summary(connection=None, use_sql: bool = False, fetch_size: int = 50000,
+                percentiles: Sequence[float] = (50, 90, 99), bins: int = 10) -> Dict[str, Any]:
+    """Summarise user ages on `connection` (default: a new ALX_prodev connection)."""
+    own_connection = connection is None
+    if own_connection:
+        connection = seed.connect_to_prodev()
+    try:
+        if use_sql:
+            return sql_summary(connection)
+        return summarize(load_ages(connection, fetch_size), percentiles, bins)
+    finally:
+        if own_connection:
+            connection.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Summarise user ages in ALX_prodev.")
+    parser.add_argument('--sql', action='store_true', help="aggregate with AVG()/COUNT() in SQL")
+    parser.add_argument('--fetch-size', type=int, default=50000)
+    parser.add_argument('--percentiles', type=float, nargs='*', default=[50, 90, 99])
+    parser.add_argument('--bins', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    summary = age_summary(use_sql=args.sql, fetch_size=args.fetch_size,
+                          percentiles=args.percentiles, bins=args.bins)
+    if not summary["count"]:
+        print("No users found.", file=sys.stderr)
+        return
+    print(f"Users: {summary['count']}")
+    print(f"Average age of users: {summary['mean']}")
+    print(f"Min age: {summary['min']}  Max age: {summary['max']}")
+    for q, value in summary.get("percentiles", {}).items():
+        print(f"p{q:g}: {value}")
+    histogram = summary.get("histogram")
+    if histogram:
+        edges = histogram["edges"]
+        for i, count in enumerate(histogram["counts"]):
+            print(f"[{edges[i]:.1f}, {edges[i + 1]:.1f}): {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Async generator counterparts of the user streaming API.
+
+Backed by aiosqlite against a local SQLite copy of user_data (create it
+with ./0-main.py --sqlite, or seed.export_sqlite()), so they can be driven
+from the same event loop as the code in python-context-async-perations-0x02:
+
+    async for user in async_stream_users():
+        ...
+
+Each stream reads ahead at most `read_ahead` batches into a bounded
+asyncio.Queue, so a slow consumer pauses its scan instead of buffering
+the table, and many scans can be interleaved on one loop.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+import aiosqlite
+
+SQLITE_DB = "user_data.db"  # written by seed.export_sqlite (./0-main.py --sqlite)
+USER_QUERY = "SELECT user_id, name, email, age FROM user_data"
+_DONE = object()
+
+
+async def _read_batches(query: str, params: Sequence[Any] = (), db_path: str = SQLITE_DB,
+                        batch_size: int = 1000, read_ahead: int = 2,
+                        as_dicts: bool = True) -> AsyncIterator[List[Any]]:
+    """
+    Run `query` and yield its rows in batches, fetched by a background task
+    that stays at most `read_ahead` batches ahead of the consumer.
+    """
+    batches: asyncio.Queue = asyncio.Queue(maxsize=read_ahead)
+
+    async def produce() -> None:
+        try:
+            async with aiosqlite.connect(db_path) as db:
+                async with db.execute(query, params) as cursor:
+                    columns = [column[0] for column in cursor.description]
+                    while True:
+                        batch = await cursor.fetchmany(batch_size)
+                        if not batch:
+                            break
+                        if as_dicts:
+                            batch = [dict(zip(columns, row)) for row in batch]
+                        await batches.put(batch)
+            await batches.put(_DONE)
+        except Exception as e:
+            await batches.put(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            batch = await batches.get()
+            if batch is _DONE:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            yield batch
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
+
+async def async_stream_users(db_path: str = SQLITE_DB, batch_size: int = 1000,
+                             read_ahead: int = 2) -> AsyncIterator[Dict[str, Any]]:
+    """Yield users one at a time as dicts, like stream_users()."""
+    async for batch in _read_batches(USER_QUERY, (), db_path, batch_size, read_ahead):
+        for row in batch:
+            yield row
+
+
+async def async_stream_users_in_batches(batch_size: int, db_path: str = SQLITE_DB,
+                                        read_ahead: int = 2) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield lists of up to batch_size users, like stream_users_in_batches()."""
+    async for batch in _read_batches(USER_QUERY, (), db_path, batch_size, read_ahead):
+        yield batch
+
+
+async def async_lazy_pagination(page_size: int, db_path: str = SQLITE_DB,
+                                after: Optional[str] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yield pages of page_size users in user_id order, like
+    lazy_pagination(mode="keyset"). Pages are fetched on demand over one
+    connection that is closed when the generator finishes or is closed.
+    """
+    async with aiosqlite.connect(db_path) as db:
+        while True:
+            if after is None:
+                query, params = f"{USER_QUERY} ORDER BY user_id LIMIT ?", (page_size,)
+            else:
+                query = f"{USER_QUERY} WHERE user_id > ? ORDER BY user_id LIMIT ?"
+                params = (after, page_size)
+            async with db.execute(query, params) as cursor:
+                columns = [column[0] for column in cursor.description]
+                page = [dict(zip(columns, row)) for row in await cursor.fetchall()]
+            if not page:
+                return
+            yield page
+            after = page[-1]['user_id']
+
+
+async def async_stream_user_ages(db_path: str = SQLITE_DB, batch_size: int = 1000,
+                                 read_ahead: int = 2) -> AsyncIterator[Any]:
+    """Yield each user's age, like stream_user_ages()."""
+    query = "SELECT age FROM user_data"
+    async for batch in _read_batches(query, (), db_path, batch_size, read_ahead, as_dicts=False):
+        for (age,) in batch:
+            yield age
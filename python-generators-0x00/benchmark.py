@@ -0,0 +1,510 @@
+#!/usr/bin/python3
+"""
+Benchmarks for the user_data generators.
+
+Runs against a local SQLite stand-in that mimics the subset of the
+mysql-connector API the generators use, so no MySQL server is needed:
+
+    ./benchmark.py --rows 200000 pagination
+"""
+import argparse
+import csv
+import sqlite3
+import time
+import tracemalloc
+import uuid
+import random
+from itertools import islice
+
+seed = __import__('seed')
+rows = __import__('rows')
+
+
+class StandInCursor:
+    """mysql-connector style cursor over a sqlite3 cursor."""
+
+    def __init__(self, cursor, dictionary=False, buffered=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+        self._buffered = buffered
+        self._rows = None
+        self.column_names = ()
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def execute(self, query, params=()):
+        query = query.replace("%s", "?").replace("INSERT IGNORE", "INSERT OR IGNORE")
+        self._cursor.execute(query, params)
+        description = self._cursor.description or ()
+        self.column_names = tuple(column[0] for column in description)
+        if self._buffered:
+            # Like a buffered MySQL cursor: read everything up front
+            self._rows = iter([self._row(row) for row in self._cursor.fetchall()])
+
+    def executemany(self, query, seq_params):
+        query = query.replace("%s", "?").replace("INSERT IGNORE", "INSERT OR IGNORE")
+        self._cursor.executemany(query, seq_params)
+
+    def fetchone(self):
+        if self._rows is not None:
+            return next(self._rows, None)
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        if self._rows is not None:
+            return list(islice(self._rows, size))
+        batch = self._cursor.fetchmany(size)
+        return [self._row(row) for row in batch] if self._dictionary else batch
+
+    def fetchall(self):
+        if self._rows is not None:
+            return list(self._rows)
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        if self._rows is not None:
+            return self._rows
+        return (self._row(row) for row in self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandInConnection:
+    """mysql-connector style connection over a sqlite3 database file."""
+
+    opened = 0
+
+    def __init__(self, path):
+        StandInConnection.opened += 1
+        # SQLite serialises writers; wait for the lock like MySQL would
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+
+    def cursor(self, dictionary=False, buffered=False, **_options):
+        return StandInCursor(self._conn.cursor(), dictionary=dictionary, buffered=buffered)
+
+    def consume_results(self):
+        pass
+
+    def shutdown(self):
+        self._conn.close()
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+def synthetic_users(rows):
+    """Deterministic (user_id, name, email, age) tuples for `rows` users."""
+    rng = random.Random(0)
+    for i in range(rows):
+        yield (str(uuid.UUID(int=rng.getrandbits(128), version=4)), f"User {i}",
+               f"user{i}@example.com", rng.randint(18, 120))
+
+
+def write_csv(path, rows):
+    """Write `rows` synthetic users to a CSV shaped like user_data.csv."""
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(('user_id', 'name', 'email', 'age'))
+        writer.writerows(synthetic_users(rows))
+
+
+def build_standin(path, rows):
+    """Create a user_data table with `rows` synthetic users at `path`."""
+    conn = sqlite3.connect(path)
+    conn.execute(f"DROP TABLE IF EXISTS {seed.TABLE_NAME}")
+    conn.execute(f"""
+        CREATE TABLE {seed.TABLE_NAME} (
+            user_id CHAR(36) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            email VARCHAR(255) NOT NULL,
+            age DECIMAL NOT NULL
+        )
+    """)
+    conn.executemany(
+        f"INSERT INTO {seed.TABLE_NAME} (user_id, name, email, age) VALUES (?, ?, ?, ?)",
+        synthetic_users(rows)
+    )
+    conn.commit()
+    conn.close()
+
+
+def use_standin(path):
+    """Point seed.connect_to_prodev at the stand-in database."""
+    seed.connect_to_prodev = lambda: StandInConnection(path)
+
+
+def _timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_pagination(args):
+    """Compare OFFSET and keyset page latency at increasing depths."""
+    paginate = __import__('2-lazy_paginate')
+    build_standin(args.db, args.rows)
+    use_standin(args.db)
+
+    conn = sqlite3.connect(args.db)
+    print(f"{'depth':>10} {'offset ms':>12} {'keyset ms':>12}")
+    depth = 0
+    while depth < args.rows:
+        after = None
+        if depth:
+            (key,) = conn.execute(
+                f"SELECT user_id FROM {seed.TABLE_NAME} ORDER BY user_id LIMIT 1 OFFSET ?",
+                (depth - 1,)).fetchone()
+            after = [key]
+        offset_s = _timed(lambda: paginate.paginate_users(args.page_size, depth), args.repeat)
+        keyset_s = _timed(lambda: paginate.paginate_users_after(args.page_size, after), args.repeat)
+        print(f"{depth:>10} {offset_s * 1000:>12.3f} {keyset_s * 1000:>12.3f}")
+        depth = depth * 10 if depth else 1000
+    conn.close()
+
+
+def bench_seed(args):
+    """Seed throughput of insert_data at different chunk sizes."""
+    write_csv(args.csv, args.rows)
+    print(f"{'chunk':>8} {'rows':>10} {'rows/sec':>12}")
+    for chunk_size in args.chunk_sizes:
+        build_standin(args.db, 0)
+        connection = StandInConnection(args.db)
+        stats = seed.insert_data(connection, args.csv, chunk_size=chunk_size)
+        connection.close()
+        print(f"{chunk_size:>8} {stats['rows']:>10} {stats['rows_per_sec']:>12.0f}")
+
+
+def bench_ingest(args):
+    """Parallel seeding throughput at increasing worker counts."""
+    write_csv(args.csv, args.rows)
+    print(f"{'workers':>8} {'rows':>10} {'rows/sec':>12} {'table rows':>12}")
+    for workers in args.workers:
+        build_standin(args.db, 0)
+        stats = seed.insert_data_parallel(
+            args.csv, workers=workers, connect=lambda: StandInConnection(args.db))
+        conn = sqlite3.connect(args.db)
+        (count,) = conn.execute(f"SELECT COUNT(*) FROM {seed.TABLE_NAME}").fetchone()
+        conn.close()
+        print(f"{workers:>8} {stats['rows']:>10} {stats['rows_per_sec']:>12.0f} {count:>12}")
+
+
+def bench_stream(args):
+    """First-row latency and tracemalloc peak of buffered vs streaming stream_users."""
+    stream = __import__('0-stream_users')
+    build_standin(args.db, args.rows)
+    print(f"{'mode':>10} {'first row ms':>14} {'total s':>9} {'peak MiB':>10}")
+    for buffered in (True, False):
+        connection = StandInConnection(args.db)
+        tracemalloc.start()
+        start = time.perf_counter()
+        users = stream.stream_users(fetch_size=args.fetch_size, buffered=buffered,
+                                    connection=connection)
+        next(users)
+        first = time.perf_counter() - start
+        for _ in users:
+            pass
+        total = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        connection.close()
+        mode = "buffered" if buffered else "streaming"
+        print(f"{mode:>10} {first * 1000:>14.2f} {total:>9.2f} {peak / 2 ** 20:>10.1f}")
+
+
+def bench_formats(args):
+    """Rows/sec and retained bytes/row for each row format."""
+    stream = __import__('0-stream_users')
+    batches = __import__('1-batch_processing')
+    build_standin(args.db, args.rows)
+    connection = StandInConnection(args.db)
+    print(f"{'format':>8} {'rows/sec':>12} {'bytes/row':>10}")
+    for row_format in ('dict', 'tuple', 'record', 'columns'):
+        start = time.perf_counter()
+        if row_format == 'columns':
+            count = sum(len(batch['user_id']) for batch in
+                        batches.stream_users_in_batches(args.batch_size, row_format, connection))
+        else:
+            count = sum(1 for _ in stream.stream_users(
+                fetch_size=args.batch_size, connection=connection, row_format=row_format))
+        rate = count / (time.perf_counter() - start)
+
+        # Memory held by one materialised batch, net of the shared strings
+        batch = next(batches.stream_users_in_batches(args.batch_size, 'tuple', connection))
+        tracemalloc.start()
+        if row_format == 'dict':
+            held = [dict(zip(rows.USER_COLUMNS, row)) for row in batch]
+        elif row_format == 'tuple':
+            held = [(user_id, name, email, age) for user_id, name, email, age in batch]
+        else:
+            held = rows.convert_batch(list(batch), row_format)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del held
+        print(f"{row_format:>8} {rate:>12.0f} {size / len(batch):>10.1f}")
+    connection.close()
+
+
+def bench_ages(args):
+    """Per-row average_user_age loop vs batched age_stats vs SQL aggregation."""
+    ages = __import__('4-stream_ages')
+    age_stats = __import__('age_stats')
+    build_standin(args.db, args.rows)
+    connection = StandInConnection(args.db)
+
+    def per_row():
+        total = count = 0
+        for age in ages.stream_user_ages(connection):
+            total += age
+            count += 1
+        return total / count
+
+    def vectorised():
+        values = age_stats.load_ages(connection)
+        return sum(values) / len(values)
+
+    def full_summary():
+        return age_stats.summarize(age_stats.load_ages(connection))["mean"]
+
+    def in_sql():
+        return age_stats.sql_summary(connection)["mean"]
+
+    backend = "numpy" if age_stats.np is not None else "array"
+    print(f"{'path':>22} {'seconds':>9} {'mean':>10}")
+    for name, func in (("per-row loop", per_row), ("batched mean", vectorised),
+                       (f"summary/{backend}", full_summary), ("SQL AVG()", in_sql)):
+        start = time.perf_counter()
+        mean = func()
+        print(f"{name:>22} {time.perf_counter() - start:>9.3f} {mean:>10.3f}")
+    connection.close()
+
+
+def bench_partitions(args):
+    """Partitioned scan throughput by partition count, checked against one full scan."""
+    scan = __import__('partitioned_scan')
+    build_standin(args.db, args.rows)
+
+    def connect():
+        return StandInConnection(args.db)
+
+    expected = [row[0] for batch in scan.scan_partition((None, None), connect, row_format='tuple')
+                for row in batch]
+    print(f"{'partitions':>10} {'ordered':>8} {'rows/sec':>12}")
+    for partitions in args.partitions:
+        for ordered in (True, False):
+            start = time.perf_counter()
+            keys = [row[0] for row in scan.partitioned_scan(
+                partitions, ordered=ordered, row_format='tuple', connect=connect)]
+            rate = len(keys) / (time.perf_counter() - start)
+            if ordered:
+                assert keys == expected, "ordered scan diverged from a single scan"
+            else:
+                assert sorted(keys) == expected, "rows duplicated or lost across partitions"
+            print(f"{partitions:>10} {str(ordered):>8} {rate:>12.0f}")
+
+
+def bench_async(args):
+    """Total throughput of N concurrent async scans vs N threads."""
+    import asyncio
+    import threading
+    async_streams = __import__('async_streams')
+    build_standin(args.db, args.rows)
+
+    async def async_scans():
+        async def scan():
+            count = 0
+            async for _ in async_streams.async_stream_users(args.db):
+                count += 1
+            return count
+        return sum(await asyncio.gather(*(scan() for _ in range(args.scans))))
+
+    def threaded_scans():
+        counts = [0] * args.scans
+
+        def scan(i):
+            conn = sqlite3.connect(args.db)
+            cursor = conn.execute(async_streams.USER_QUERY)
+            columns = [column[0] for column in cursor.description]
+            while True:
+                batch = cursor.fetchmany(1000)
+                if not batch:
+                    break
+                counts[i] += len([dict(zip(columns, row)) for row in batch])
+            conn.close()
+
+        threads = [threading.Thread(target=scan, args=(i,)) for i in range(args.scans)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(counts)
+
+    print(f"{'mode':>8} {'scans':>6} {'rows':>10} {'rows/sec':>12}")
+    for mode, run in (("asyncio", lambda: asyncio.run(async_scans())), ("threads", threaded_scans)):
+        start = time.perf_counter()
+        total = run()
+        rate = total / (time.perf_counter() - start)
+        print(f"{mode:>8} {args.scans:>6} {total:>10} {rate:>12.0f}")
+
+
+def bench_prefetch(args):
+    """Batch pipeline time with and without prefetching, plus idle counters."""
+    batches = __import__('1-batch_processing')
+    build_standin(args.db, args.rows)
+    connection = StandInConnection(args.db)
+    print(f"{'depth':>6} {'seconds':>9} {'producer idle':>14} {'consumer idle':>14}")
+    for depth in args.depths:
+        stats = {}
+        start = time.perf_counter()
+        for _ in batches.stream_users_in_batches(args.batch_size, connection=connection,
+                                                 stats=stats, prefetch_depth=depth):
+            time.sleep(args.work_ms / 1000)  # simulated per-batch processing
+        elapsed = time.perf_counter() - start
+        print(f"{depth:>6} {elapsed:>9.3f} {stats.get('producer_wait', 0):>14.3f} "
+              f"{stats.get('consumer_wait', 0):>14.3f}")
+    connection.close()
+
+
+def bench_snapshot(args):
+    """Snapshot load time and age scan vs CSV parsing and DB scanning."""
+    snapshot = __import__('snapshot')
+    write_csv(args.csv, args.rows)
+    build_standin(args.db, args.rows)
+    start = time.perf_counter()
+    snapshot.export_snapshot(snapshot.rows_from_csv(args.csv), args.snapshot)
+    print(f"export: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    snap = snapshot.Snapshot(args.snapshot)
+    print(f"open snapshot: {(time.perf_counter() - start) * 1000:.3f} ms ({len(snap)} rows)")
+
+    def from_snapshot():
+        return sum(snap.ages) / len(snap)
+
+    def from_csv():
+        with open(args.csv, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader)
+            ages = [int(row[3]) for row in reader]
+        return sum(ages) / len(ages)
+
+    def from_db():
+        connection = StandInConnection(args.db)
+        ages = [row[3] for row in snapshot.rows_from_db(connection)]
+        connection.close()
+        return sum(ages) / len(ages)
+
+    print(f"{'source':>10} {'avg-age s':>10} {'mean':>10}")
+    for name, func in (("snapshot", from_snapshot), ("csv", from_csv), ("db scan", from_db)):
+        start = time.perf_counter()
+        mean = func()
+        print(f"{name:>10} {time.perf_counter() - start:>10.3f} {mean:>10.3f}")
+    snap.close()
+
+
+def bench_csv(args):
+    """MB/s parsed by csv.DictReader vs csv_batches.read_csv_batches."""
+    import os
+    csv_batches = __import__('csv_batches')
+    write_csv(args.csv, args.rows)
+    megabytes = os.path.getsize(args.csv) / 2 ** 20
+
+    def dict_reader():
+        with open(args.csv, newline='', encoding='utf-8') as f:
+            return sum(int(row['age']) for row in csv.DictReader(f))
+
+    def column_batches():
+        return sum(sum(batch['age']) for batch in csv_batches.read_csv_batches(
+            args.csv, types={'age': int}))
+
+    def validated_batches():
+        return sum(sum(batch['age']) for batch in csv_batches.read_csv_batches(
+            args.csv, types=seed.USER_TYPES))
+
+    print(f"{'reader':>18} {'MB/s':>8} {'peak MiB':>9}")
+    for name, func in (("DictReader", dict_reader), ("column batches", column_batches),
+                       ("+ UUID validation", validated_batches)):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        # Second, traced pass: tracemalloc would distort the timing
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>18} {megabytes / elapsed:>8.1f} {peak / 2 ** 20:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default='benchmark.db', help="stand-in SQLite file")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    pagination = commands.add_parser('pagination', help=bench_pagination.__doc__)
+    pagination.add_argument('--page-size', type=int, default=100)
+    pagination.set_defaults(run=bench_pagination)
+
+    seeding = commands.add_parser('seed', help=bench_seed.__doc__)
+    seeding.add_argument('--csv', default='benchmark.csv', help="generated CSV path")
+    seeding.add_argument('--chunk-sizes', type=int, nargs='+', default=[1, 100, 1000, 10000])
+    seeding.set_defaults(run=bench_seed)
+
+    ingest = commands.add_parser('ingest', help=bench_ingest.__doc__)
+    ingest.add_argument('--csv', default='benchmark.csv', help="generated CSV path")
+    ingest.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    ingest.set_defaults(run=bench_ingest)
+
+    streaming = commands.add_parser('stream', help=bench_stream.__doc__)
+    streaming.add_argument('--fetch-size', type=int, default=1000)
+    streaming.set_defaults(run=bench_stream)
+
+    formats = commands.add_parser('formats', help=bench_formats.__doc__)
+    formats.add_argument('--batch-size', type=int, default=10000)
+    formats.set_defaults(run=bench_formats)
+
+    aggregation = commands.add_parser('ages', help=bench_ages.__doc__)
+    aggregation.set_defaults(run=bench_ages)
+
+    partitioned = commands.add_parser('partitions', help=bench_partitions.__doc__)
+    partitioned.add_argument('--partitions', type=int, nargs='+', default=[1, 2, 4, 8])
+    partitioned.set_defaults(run=bench_partitions)
+
+    concurrent = commands.add_parser('async', help=bench_async.__doc__)
+    concurrent.add_argument('--scans', type=int, default=50)
+    concurrent.set_defaults(run=bench_async)
+
+    prefetching = commands.add_parser('prefetch', help=bench_prefetch.__doc__)
+    prefetching.add_argument('--batch-size', type=int, default=1000)
+    prefetching.add_argument('--work-ms', type=float, default=2.0)
+    prefetching.add_argument('--depths', type=int, nargs='+', default=[0, 1, 4])
+    prefetching.set_defaults(run=bench_prefetch)
+
+    snapshots = commands.add_parser('snapshot', help=bench_snapshot.__doc__)
+    snapshots.add_argument('--csv', default='benchmark.csv', help="generated CSV path")
+    snapshots.add_argument('--snapshot', default='benchmark.snap', help="snapshot path")
+    snapshots.set_defaults(run=bench_snapshot)
+
+    parsing = commands.add_parser('csv', help=bench_csv.__doc__)
+    parsing.add_argument('--csv', default='benchmark.csv', help="generated CSV path")
+    parsing.set_defaults(run=bench_csv)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
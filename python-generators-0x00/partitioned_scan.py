@@ -0,0 +1,141 @@
+"""
+Parallel range-partitioned scans of user_data.
+
+The user_id key space is cut into contiguous half-open ranges
+[lo, hi) - the first unbounded below, the last unbounded above - so
+every row falls in exactly one partition whatever its key looks like.
+Each partition is scanned on its own connection by a thread pool and
+the results are merged into one stream:
+
+    for user in partitioned_scan(partitions=8):
+        ...
+
+ordered=True yields rows in global user_id order (partition by
+partition); ordered=False yields rows as soon as any partition has them.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+seed = __import__('seed')
+rows = __import__('rows')
+
+KEY_SPACE = 16 ** 8  # first 8 hex digits of a UUID
+_DONE = object()
+
+Range = Tuple[Optional[str], Optional[str]]
+
+
+def key_ranges(partitions: int) -> List[Range]:
+    """Split the user_id space into `partitions` contiguous [lo, hi) ranges."""
+    if partitions < 1:
+        raise ValueError("partitions must be a positive integer")
+    bounds = [f"{KEY_SPACE * i // partitions:08x}" for i in range(1, partitions)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def _range_query(key_range: Range) -> Tuple[str, List[str]]:
+    lo, hi = key_range
+    clauses, params = [], []
+    if lo is not None:
+        clauses.append("user_id >= %s")
+        params.append(lo)
+    if hi is not None:
+        clauses.append("user_id < %s")
+        params.append(hi)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return (f"SELECT user_id, name, email, age FROM {seed.TABLE_NAME}{where} "
+            "ORDER BY user_id"), params
+
+
+def scan_partition(key_range: Range, connect: Optional[Callable] = None,
+                   batch_size: int = 1000, row_format: str = 'dict') -> Iterator[List[Any]]:
+    """Yield batches of the rows in one key range, in user_id order."""
+    connection = (connect or seed.connect_to_prodev)()
+    if connection is None:
+        # connect_to_prodev reports failures by returning None
+        raise ConnectionError(f"Could not connect to {seed.DB_NAME} to scan {key_range}")
+    cursor = None
+    exhausted = False
+    try:
+        cursor = rows.open_cursor(connection, row_format)
+        query, params = _range_query(key_range)
+        cursor.execute(query, params)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield rows.convert_batch(batch, row_format)
+        exhausted = True
+    finally:
+        if not exhausted and cursor is not None:
+            # Abandoned or failed mid-scan: drop the socket instead of
+            # draining rows
+            connection.shutdown()
+        else:
+            if cursor is not None:
+                cursor.close()
+            connection.close()
+
+
+def partitioned_scan(partitions: int = 4, workers: Optional[int] = None,
+                     ordered: bool = True, batch_size: int = 1000,
+                     row_format: str = 'dict', connect: Optional[Callable] = None,
+                     queue_batches: int = 4) -> Iterator[Any]:
+    """
+    Scan user_data with `workers` threads (default: one per partition)
+    and yield its rows one at a time. Each partition buffers at most
+    `queue_batches` batches ahead of the consumer. Closing the generator
+    stops the remaining scans and closes their connections.
+    """
+    rows.check_format(row_format)
+    ranges = key_ranges(partitions)
+    stop = threading.Event()
+    if ordered:
+        queues = [queue.Queue(maxsize=queue_batches) for _ in ranges]
+    else:
+        shared = queue.Queue(maxsize=queue_batches * len(ranges))
+        queues = [shared] * len(ranges)
+
+    def put(q: queue.Queue, item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan(index: int) -> None:
+        out = queues[index]
+        if stop.is_set():
+            # Closed before this partition's turn came: don't connect
+            return
+        try:
+            for batch in scan_partition(ranges[index], connect, batch_size, row_format):
+                if not put(out, batch):
+                    return
+        except BaseException as e:
+            put(out, e)
+        finally:
+            put(out, _DONE)
+
+    with ThreadPoolExecutor(max_workers=workers or len(ranges)) as pool:
+        try:
+            for index in range(len(ranges)):
+                pool.submit(scan, index)
+            remaining = len(ranges)
+            current = 0
+            while remaining:
+                item = queues[current].get()
+                if item is _DONE:
+                    remaining -= 1
+                    if ordered:
+                        current += 1
+                    continue
+                if isinstance(item, BaseException):
+                    raise item
+                yield from item
+        finally:
+            stop.set()
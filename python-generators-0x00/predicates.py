@@ -0,0 +1,242 @@
+"""
+Composable row filters that compile to SQL where they can.
+
+    from predicates import col, where
+    adults = col('age') > 25
+    gmail = where(lambda user: user['email'].endswith('@gmail.com'), columns=('email',))
+    stream_users_in_batches(100, where=adults & gmail)
+
+Comparisons on columns become part of the SQL WHERE clause; anything
+that cannot be expressed in SQL (arbitrary Python callables, or an OR
+mixing the two) is evaluated client-side on the fetched rows. Callables
+receive rows as dicts, UserRecords or, for the 'tuple' and 'columns'
+formats, tuples in the order of the selected columns. Pass where() the
+columns a callable reads so a restricted `columns` selection still
+fetches them; without it every column is fetched.
+"""
+import operator
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+rows = __import__('rows')
+
+_OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+Getter = Callable[[Any, str], Any]
+
+
+class Predicate:
+    """Base class: a filter that may be pushed down into SQL."""
+
+    def sql(self) -> Optional[Tuple[str, List[Any]]]:
+        """(fragment, params) for the WHERE clause, or None if not pushable."""
+        return None
+
+    def columns(self) -> List[str]:
+        """Columns a client-side evaluation needs to read."""
+        return []
+
+    def evaluate(self, row: Any, get: Getter) -> bool:
+        raise NotImplementedError
+
+    def __and__(self, other: "Predicate") -> "Predicate":
+        return And(self, other)
+
+    def __or__(self, other: "Predicate") -> "Predicate":
+        return Or(self, other)
+
+    def __invert__(self) -> "Predicate":
+        return Not(self)
+
+
+class Comparison(Predicate):
+    """`column op value`, e.g. age > 25."""
+
+    def __init__(self, column: str, op: str, value: Any):
+        if column not in rows.USER_COLUMNS:
+            raise ValueError(f"Unknown column: {column}")
+        self.column = column
+        self.op = op
+        self.value = value
+
+    def sql(self):
+        return f"{self.column} {self.op} %s", [self.value]
+
+    def columns(self):
+        return [self.column]
+
+    def evaluate(self, row, get):
+        return _OPERATORS[self.op](get(row, self.column), self.value)
+
+
+class In(Comparison):
+    """`column IN (values...)`."""
+
+    def __init__(self, column: str, values: Iterable[Any]):
+        super().__init__(column, 'IN', tuple(values))
+
+    def sql(self):
+        if not self.value:
+            return "1 = 0", []
+        placeholders = ", ".join(["%s"] * len(self.value))
+        return f"{self.column} IN ({placeholders})", list(self.value)
+
+    def evaluate(self, row, get):
+        return get(row, self.column) in self.value
+
+
+class And(Predicate):
+    def __init__(self, *parts: Predicate):
+        # Flatten a & b & c so each term can be pushed down on its own
+        self.parts = tuple(p for part in parts
+                           for p in (part.parts if isinstance(part, And) else (part,)))
+
+    def sql(self):
+        compiled = [part.sql() for part in self.parts]
+        if any(c is None for c in compiled):
+            return None
+        return ("(" + " AND ".join(f for f, _ in compiled) + ")",
+                [p for _, params in compiled for p in params])
+
+    def columns(self):
+        return [c for part in self.parts for c in part.columns()]
+
+    def evaluate(self, row, get):
+        return all(part.evaluate(row, get) for part in self.parts)
+
+
+class Or(Predicate):
+    def __init__(self, *parts: Predicate):
+        self.parts = parts
+
+    def sql(self):
+        compiled = [part.sql() for part in self.parts]
+        if any(c is None for c in compiled):
+            return None
+        return ("(" + " OR ".join(f for f, _ in compiled) + ")",
+                [p for _, params in compiled for p in params])
+
+    def columns(self):
+        return [c for part in self.parts for c in part.columns()]
+
+    def evaluate(self, row, get):
+        return any(part.evaluate(row, get) for part in self.parts)
+
+
+class Not(Predicate):
+    def __init__(self, part: Predicate):
+        self.part = part
+
+    def sql(self):
+        compiled = self.part.sql()
+        if compiled is None:
+            return None
+        fragment, params = compiled
+        return f"NOT ({fragment})", params
+
+    def columns(self):
+        return self.part.columns()
+
+    def evaluate(self, row, get):
+        return not self.part.evaluate(row, get)
+
+
+class PythonPredicate(Predicate):
+    """
+    Arbitrary callable on the fetched row; always evaluated client-side.
+    `columns` names the columns func reads; if not given, every user
+    column is fetched so func can read any of them.
+    """
+
+    def __init__(self, func: Callable[[Any], bool], columns: Optional[Sequence[str]] = None):
+        if columns is not None:
+            for column in columns:
+                if column not in rows.USER_COLUMNS:
+                    raise ValueError(f"Unknown column: {column}")
+        self.func = func
+        self._columns = list(columns) if columns is not None else list(rows.USER_COLUMNS)
+
+    def columns(self):
+        return self._columns
+
+    def evaluate(self, row, get):
+        return bool(self.func(row))
+
+
+class Column:
+    """Entry point for building comparisons: col('age') > 25."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __eq__(self, value):
+        return Comparison(self.name, '=', value)
+
+    def __ne__(self, value):
+        return Comparison(self.name, '!=', value)
+
+    def __lt__(self, value):
+        return Comparison(self.name, '<', value)
+
+    def __le__(self, value):
+        return Comparison(self.name, '<=', value)
+
+    def __gt__(self, value):
+        return Comparison(self.name, '>', value)
+
+    def __ge__(self, value):
+        return Comparison(self.name, '>=', value)
+
+    def in_(self, values: Iterable[Any]) -> In:
+        return In(self.name, values)
+
+    __hash__ = None
+
+
+def col(name: str) -> Column:
+    return Column(name)
+
+
+def where(func: Callable[[Any], bool], columns: Optional[Sequence[str]] = None) -> PythonPredicate:
+    return PythonPredicate(func, columns)
+
+
+def split(predicate: Optional[Predicate]) -> Tuple[Optional[Tuple[str, List[Any]]], Optional[Predicate]]:
+    """
+    Split a predicate into the part SQL can evaluate and a client-side
+    residual. Top-level AND terms are pushed down individually, so
+    `sql_part & python_part` still filters server-side on sql_part.
+    """
+    if predicate is None:
+        return None, None
+    terms = predicate.parts if isinstance(predicate, And) else (predicate,)
+    pushed: List[Tuple[str, List[Any]]] = []
+    residual: List[Predicate] = []
+    for term in terms:
+        compiled = term.sql()
+        if compiled is None:
+            residual.append(term)
+        else:
+            pushed.append(compiled)
+    sql = None
+    if pushed:
+        sql = (" AND ".join(f for f, _ in pushed), [p for _, params in pushed for p in params])
+    if not residual:
+        return sql, None
+    return sql, residual[0] if len(residual) == 1 else And(*residual)
+
+
+def getter(row_format: str, columns: Sequence[str]) -> Getter:
+    """Column accessor for rows fetched in `row_format` with `columns`."""
+    if row_format == 'dict':
+        return lambda row, column: row[column]
+    if row_format == 'record':
+        return getattr
+    index = {column: i for i, column in enumerate(columns)}
+    return lambda row, column: row[index[column]]
@@ -0,0 +1,62 @@
+from typing import Any, Dict, List, Sequence, Tuple
+
+USER_COLUMNS = ('user_id', 'name', 'email', 'age')
+ROW_FORMATS = ('dict', 'tuple', 'record')
+BATCH_FORMATS = ROW_FORMATS + ('columns',)
+
+
+class UserRecord:
+    """Fixed-layout user row; much smaller and cheaper to build than a dict."""
+
+    __slots__ = USER_COLUMNS
+
+    def __init__(self, user_id, name, email, age):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    def __iter__(self):
+        return iter((self.user_id, self.name, self.email, self.age))
+
+    def __eq__(self, other):
+        if not isinstance(other, UserRecord):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return (f"UserRecord(user_id={self.user_id!r}, name={self.name!r}, "
+                f"email={self.email!r}, age={self.age!r})")
+
+
+def check_format(row_format: str, allowed: Sequence[str] = ROW_FORMATS) -> None:
+    """Raise ValueError unless row_format is one of `allowed`."""
+    if row_format not in allowed:
+        raise ValueError(f"Unknown row format {row_format!r}; expected one of {allowed}")
+
+
+def open_cursor(connection, row_format: str, buffered: bool = False):
+    """Cursor that hands back dicts only when the caller asked for them."""
+    return connection.cursor(dictionary=row_format == 'dict', buffered=buffered)
+
+
+def convert_batch(rows: List[Any], row_format: str, columns: Sequence[str] = USER_COLUMNS):
+    """
+    Convert rows fetched by open_cursor() into `row_format`.
+
+    'dict' and 'tuple' rows are already in shape and returned as is;
+    'record' builds UserRecord objects and 'columns' transposes the batch
+    into a dict of column name -> tuple of values.
+    """
+    if row_format == 'record':
+        return [UserRecord(*row) for row in rows]
+    if row_format == 'columns':
+        return to_columns(rows, columns)
+    return rows
+
+
+def to_columns(rows: List[Tuple], columns: Sequence[str] = USER_COLUMNS) -> Dict[str, Tuple]:
+    """Transpose tuple rows into a column-oriented batch."""
+    if not rows:
+        return {column: () for column in columns}
+    return dict(zip(columns, zip(*rows)))
@@ -1,11 +1,24 @@
 import csv
+import io
+import os
+import queue
+import sqlite3
+import threading
+import time
 import uuid
 import mysql.connector
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from mysql.connector import Error
-from typing import Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+csv_batches = __import__('csv_batches')
 
 DB_NAME = "ALX_prodev"
 TABLE_NAME = "user_data"
+SHARD_BYTES = 8 * 1024 * 1024
+SQLITE_COPY = "user_data.db"
 
 def connect_db() -> Optional[mysql.connector.MySQLConnection]:
     """Connect to the MySQL server (not a specific DB)."""
@@ -54,6 +67,7 @@ def create_table(connection) -> None:
                 name VARCHAR(255) NOT NULL,
                 email VARCHAR(255) NOT NULL,
                 age DECIMAL NOT NULL,
+                seq BIGINT NOT NULL AUTO_INCREMENT UNIQUE,
                 INDEX (user_id)
             );
         """)
@@ -61,23 +75,237 @@ def create_table(connection) -> None:
     finally:
         cursor.close()
 
-def insert_data(connection, csv_path: str) -> None:
-    """Insert CSV data into the user_data table, avoiding duplicates."""
+def add_sequence_column(connection) -> None:
+    """
+    Give an existing user_data table the AUTO_INCREMENT `seq` column that
+    create_table now adds, numbering the rows already present. `seq` is
+    the insertion-order high-water mark used by incremental aggregates.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = 'seq'",
+            (DB_NAME, TABLE_NAME)
+        )
+        (present,) = cursor.fetchone()
+        if not present:
+            cursor.execute(
+                f"ALTER TABLE {TABLE_NAME} "
+                "ADD COLUMN seq BIGINT NOT NULL AUTO_INCREMENT UNIQUE"
+            )
+    finally:
+        cursor.close()
+
+def _chunks(rows: Iterable[Tuple], chunk_size: int) -> Iterator[List[Tuple]]:
+    """Split an iterable of rows into lists of at most chunk_size rows."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def _user_id(value: str) -> str:
+    """Validate a UUID string and return it in canonical form."""
+    return str(uuid.UUID(value))
+
+USER_TYPES = {'user_id': _user_id, 'age': int}
+
+def insert_data(connection, csv_path: str, chunk_size: int = 1000) -> Dict[str, float]:
+    """
+    Insert CSV data into the user_data table, avoiding duplicates.
+
+    Rows are streamed from the CSV in column batches of chunk_size (see
+    csv_batches.read_csv_batches; malformed rows are skipped) and sent with
+    executemany, which mysql-connector rewrites into one multi-row INSERT
+    per chunk; each chunk is committed on its own so memory stays bounded
+    by chunk_size. INSERT IGNORE keeps reruns idempotent on user_id.
+    Returns the number of rows read and rejected, elapsed seconds and rows/sec.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+    query = f"""INSERT IGNORE INTO {TABLE_NAME} (user_id, name, email, age)
+                VALUES (%s, %s, %s, %s)"""
+    stats: Dict[str, int] = {}
+    start = time.perf_counter()
     cursor = connection.cursor()
     try:
-        with open(csv_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                user_id = row['user_id']
-                name = row['name']
-                email = row['email']
-                age = row['age']
-                # Idempotent insert: ignore if exists
-                cursor.execute(
-                    f"""INSERT IGNORE INTO {TABLE_NAME} (user_id, name, email, age)
-                        VALUES (%s, %s, %s, %s)""",
-                    (user_id, name, email, age)
-                )
-        connection.commit()
+        for batch in csv_batches.read_csv_batches(
+                csv_path, chunk_size, columns=('user_id', 'name', 'email', 'age'),
+                types=USER_TYPES, stats=stats):
+            cursor.executemany(query, list(zip(batch['user_id'], batch['name'],
+                                               batch['email'], batch['age'])))
+            connection.commit()
     finally:
         cursor.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": stats.get("rows", 0),
+        "rejected": stats.get("rejected", 0),
+        "seconds": elapsed,
+        "rows_per_sec": stats.get("rows", 0) / elapsed if elapsed else 0.0,
+    }
+
+def shard_offsets(csv_path: str, shards: int) -> List[Tuple[int, int]]:
+    """
+    Split the CSV body (everything after the header) into at most `shards`
+    byte ranges whose boundaries fall on line starts. Assumes no quoted
+    field spans a newline, which holds for user_data.csv.
+    """
+    size = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as f:
+        f.readline()
+        body_start = f.tell()
+        step = max(1, (size - body_start) // max(1, shards))
+        bounds = [body_start]
+        while bounds[-1] < size:
+            f.seek(min(bounds[-1] + step, size))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    return list(zip(bounds, bounds[1:]))
+
+def _parse_shard(task: Tuple[str, int, int]) -> Tuple[List[Tuple], int]:
+    """
+    Parse one byte range of the CSV into normalised insert rows, converting
+    with USER_TYPES so a row is accepted exactly when insert_data accepts it.
+    Runs in a worker process; returns (rows, rejected_row_count).
+    """
+    csv_path, start, end = task
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start).decode('utf-8')
+    to_user_id, to_age = USER_TYPES['user_id'], USER_TYPES['age']
+    rows = []
+    rejected = 0
+    for record in csv.reader(io.StringIO(data, newline='')):
+        if not record:
+            continue  # blank line, skipped like read_csv_batches does
+        try:
+            user_id, name, email, age = record
+            rows.append((to_user_id(user_id), name, email, to_age(age)))
+        except (ValueError, TypeError, ArithmeticError):
+            rejected += 1
+    return rows, rejected
+
+def insert_data_parallel(csv_path: str, workers: int = 4, writers: Optional[int] = None,
+                         chunk_size: int = 1000,
+                         connect: Optional[Callable] = None) -> Dict[str, float]:
+    """
+    Parallel variant of insert_data.
+
+    The CSV is cut into line-aligned byte-range shards that a pool of
+    `workers` processes parses and validates. Parsed rows are cut into
+    chunks and queued to `writers` threads (default: `workers`), each
+    holding its own connection from `connect` (default connect_to_prodev)
+    and committing chunk by chunk with INSERT IGNORE. At most 2 * workers
+    shards are parsed ahead of the writers, so memory is bounded by the
+    shard size rather than the file size. The final table contents are
+    the same for any worker count, and the same as insert_data's; the
+    returned stats have the same keys.
+    """
+    if workers < 1 or chunk_size < 1:
+        raise ValueError("workers and chunk_size must be positive integers")
+    connect = connect or connect_to_prodev
+    writers = writers or workers
+    query = f"""INSERT IGNORE INTO {TABLE_NAME} (user_id, name, email, age)
+                VALUES (%s, %s, %s, %s)"""
+    # Bounded so that, with the window of in-flight shards below, parsing
+    # cannot outrun the writers by more than a few shards
+    chunks: "queue.Queue[Optional[List[Tuple]]]" = queue.Queue(maxsize=writers * 4)
+    errors: List[BaseException] = []
+
+    def write() -> None:
+        connection = cursor = None
+        try:
+            connection = connect()
+            cursor = connection.cursor()
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    return
+                if not errors:
+                    cursor.executemany(query, chunk)
+                    connection.commit()
+        except BaseException as e:
+            errors.append(e)
+            # Keep draining so the producer never blocks on a dead writer
+            while chunks.get() is not None:
+                pass
+        finally:
+            if cursor is not None:
+                cursor.close()
+            if connection is not None:
+                connection.close()
+
+    threads = [threading.Thread(target=write, daemon=True) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+
+    rows_read = 0
+    rejected = 0
+    start = time.perf_counter()
+    shards = max(workers * 4, os.path.getsize(csv_path) // SHARD_BYTES)
+    tasks = [(csv_path, lo, hi) for lo, hi in shard_offsets(csv_path, shards)]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # pool.map would submit every shard up front and hold all the
+            # parsed results; keep only a window of shards in flight
+            tasks = iter(tasks)
+            pending = deque(pool.submit(_parse_shard, task)
+                            for task in islice(tasks, workers * 2))
+            while pending:
+                rows, bad = pending.popleft().result()
+                for task in islice(tasks, 1):
+                    pending.append(pool.submit(_parse_shard, task))
+                rejected += bad
+                rows_read += len(rows)
+                for chunk in _chunks(rows, chunk_size):
+                    chunks.put(chunk)
+    finally:
+        for _ in threads:
+            chunks.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": rows_read,
+        "rejected": rejected,
+        "seconds": elapsed,
+        "rows_per_sec": rows_read / elapsed if elapsed else 0.0,
+    }
+
+def export_sqlite(connection, sqlite_path: str = SQLITE_COPY, fetch_size: int = 10000) -> int:
+    """
+    Copy the user_data table into a SQLite database at sqlite_path, the
+    local copy the async_streams generators read. The copy is built in a
+    temporary file and moved into place, so readers never see a partial
+    table. Returns the number of rows copied.
+    """
+    snapshot = __import__('snapshot')
+    partial = f"{sqlite_path}.partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    copy = sqlite3.connect(partial)
+    try:
+        copy.execute(f"""
+            CREATE TABLE {TABLE_NAME} (
+                user_id CHAR(36) PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                email VARCHAR(255) NOT NULL,
+                age DECIMAL NOT NULL
+            )
+        """)
+        query = f"INSERT INTO {TABLE_NAME} (user_id, name, email, age) VALUES (?, ?, ?, ?)"
+        count = 0
+        for chunk in _chunks(snapshot.rows_from_db(connection, fetch_size), fetch_size):
+            copy.executemany(query, [(user_id, name, email, int(age))
+                                     for user_id, name, email, age in chunk])
+            count += len(chunk)
+        copy.commit()
+    finally:
+        copy.close()
+    os.replace(partial, sqlite_path)
+    return count
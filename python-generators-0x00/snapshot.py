@@ -0,0 +1,267 @@
+#!/usr/bin/python3
+"""
+Compact columnar binary snapshots of user_data.
+
+A snapshot stores each column contiguously so a reader can mmap the file
+and use the columns in place, without parsing:
+
+    header    magic, row count, offset of each section below
+    user_id   16 raw UUID bytes per row
+    age       int32 per row
+    name      (rows + 1) uint64 offsets into a UTF-8 string heap, then the heap
+    email     same layout as name
+
+All integers are little-endian and every section starts 8-byte aligned.
+
+    ./snapshot.py export users.snap              # from ALX_prodev
+    ./snapshot.py export users.snap --csv user_data.csv
+    ./snapshot.py info users.snap
+"""
+import argparse
+import csv
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+import uuid
+import weakref
+from array import array
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+MAGIC = b"UDSNAP01"
+SECTIONS = ('user_id', 'age', 'name_offsets', 'name_heap', 'email_offsets', 'email_heap')
+HEADER = struct.Struct(f"<8sQ{len(SECTIONS)}Q")
+ALIGN = 8
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+def _pad(f) -> None:
+    f.write(b"\0" * (-f.tell() % ALIGN))
+
+
+def _write_ints(f, typecode: str, values) -> None:
+    values = array(typecode, values)
+    if not LITTLE_ENDIAN:
+        values.byteswap()
+    values.tofile(f)
+
+
+def rows_from_csv(csv_path: str) -> Iterator[Tuple[str, str, str, Any]]:
+    """(user_id, name, email, age) rows of a CSV shaped like user_data.csv."""
+    with open(csv_path, newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)
+        for user_id, name, email, age in reader:
+            yield user_id, name, email, age
+
+
+def rows_from_db(connection, fetch_size: int = 10000) -> Iterator[Tuple[str, str, str, Any]]:
+    """(user_id, name, email, age) rows of the user_data table."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT user_id, name, email, age FROM user_data")
+        while True:
+            batch = cursor.fetchmany(fetch_size)
+            if not batch:
+                break
+            yield from batch
+    finally:
+        cursor.close()
+
+
+def export_snapshot(rows: Iterable[Tuple[str, str, str, Any]], path: str,
+                    chunk_size: int = 65536) -> int:
+    """
+    Write `rows` to a snapshot at `path` and return the row count.
+    Columns are spooled to temporary files chunk by chunk, so memory use
+    does not grow with the number of rows.
+    """
+    spools = {name: tempfile.TemporaryFile() for name in SECTIONS}
+    count = 0
+    name_end = email_end = 0
+    try:
+        _write_ints(spools['name_offsets'], 'Q', [0])
+        _write_ints(spools['email_offsets'], 'Q', [0])
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) < chunk_size:
+                continue
+            name_end, email_end = _write_chunk(spools, chunk, name_end, email_end)
+            count += len(chunk)
+            chunk = []
+        if chunk:
+            _write_chunk(spools, chunk, name_end, email_end)
+            count += len(chunk)
+
+        with open(path, 'wb') as out:
+            out.write(b"\0" * HEADER.size)
+            offsets = []
+            for name in SECTIONS:
+                _pad(out)
+                offsets.append(out.tell())
+                spools[name].seek(0)
+                shutil.copyfileobj(spools[name], out)
+            out.seek(0)
+            out.write(HEADER.pack(MAGIC, count, *offsets))
+    finally:
+        for spool in spools.values():
+            spool.close()
+    return count
+
+
+def _write_chunk(spools, chunk, name_end: int, email_end: int) -> Tuple[int, int]:
+    """Append one chunk of rows to the column spools; returns the new heap ends."""
+    user_ids, names, emails, ages = zip(*chunk)
+    spools['user_id'].write(b"".join(uuid.UUID(str(u)).bytes for u in user_ids))
+    _write_ints(spools['age'], 'i', (int(Decimal(age)) for age in ages))
+    name_end = _write_strings(spools['name_heap'], spools['name_offsets'], names, name_end)
+    email_end = _write_strings(spools['email_heap'], spools['email_offsets'], emails, email_end)
+    return name_end, email_end
+
+
+def _write_strings(heap, offsets, values, end: int) -> int:
+    encoded = [value.encode('utf-8') for value in values]
+    ends = []
+    for value in encoded:
+        end += len(value)
+        ends.append(end)
+    heap.write(b"".join(encoded))
+    _write_ints(offsets, 'Q', ends)
+    return end
+
+
+class StringColumn:
+    """Read-only sequence of strings stored as offsets into a byte heap."""
+
+    def __init__(self, offsets: memoryview, heap: memoryview):
+        self._offsets = offsets
+        self._heap = heap
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        return str(self._heap[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+    def raw(self, i: int) -> memoryview:
+        """Zero-copy UTF-8 bytes of row i."""
+        return self._heap[self._offsets[i]:self._offsets[i + 1]]
+
+
+class Snapshot:
+    """
+    Memory-mapped snapshot reader. Opening only maps the file and reads
+    the header; column views index straight into the mapping.
+    close() stops any unfinished stream_users() iterators and releases
+    the column views; release slices taken from a column (including
+    StringColumn.raw()) before calling it.
+    """
+
+    def __init__(self, path: str):
+        if not LITTLE_ENDIAN:
+            raise NotImplementedError("zero-copy snapshot views need a little-endian host")
+        self._iterators = weakref.WeakSet()
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.rows, *offsets = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a user_data snapshot")
+        bounds = dict(zip(SECTIONS, zip(offsets, offsets[1:] + [len(self._map)])))
+        view = memoryview(self._map)
+        n = self.rows
+        self._views = [view]
+        self.user_id_bytes = self._section(view, bounds, 'user_id', 16 * n)
+        self.ages = self._section(view, bounds, 'age', 4 * n, 'i')
+        self.names = StringColumn(
+            self._section(view, bounds, 'name_offsets', 8 * (n + 1), 'Q'),
+            self._section(view, bounds, 'name_heap'))
+        self.emails = StringColumn(
+            self._section(view, bounds, 'email_offsets', 8 * (n + 1), 'Q'),
+            self._section(view, bounds, 'email_heap'))
+
+    def _section(self, view, bounds, name: str, size: Optional[int] = None,
+                 fmt: Optional[str] = None) -> memoryview:
+        start, end = bounds[name]
+        section = view[start:start + size if size is not None else end]
+        self._views.append(section)
+        if fmt is not None:
+            # A cast is a separate export of the mapping: track it as well
+            section = section.cast(fmt)
+            self._views.append(section)
+        return section
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def user_id(self, i: int) -> str:
+        return str(uuid.UUID(bytes=bytes(self.user_id_bytes[16 * i:16 * i + 16])))
+
+    def stream_users(self) -> Iterator[Dict[str, Any]]:
+        """Yield rows as dicts with the same keys as stream_users()."""
+        users = self._stream_users()
+        self._iterators.add(users)
+        return users
+
+    def _stream_users(self) -> Iterator[Dict[str, Any]]:
+        names, emails, ages = self.names, self.emails, self.ages
+        for i in range(self.rows):
+            yield {'user_id': self.user_id(i), 'name': names[i],
+                   'email': emails[i], 'age': ages[i]}
+
+    def close(self) -> None:
+        # A suspended iterator holds column views; end it before unmapping
+        for users in list(self._iterators):
+            users.close()
+        for attr in ('user_id_bytes', 'ages', 'names', 'emails'):
+            self.__dict__.pop(attr, None)
+        for view in reversed(getattr(self, '_views', [])):
+            view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or inspect user_data snapshots.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="write a snapshot")
+    export.add_argument('path')
+    export.add_argument('--csv', help="read this CSV instead of the ALX_prodev database")
+    info = commands.add_parser('info', help="print a snapshot's size and first rows")
+    info.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        if args.csv:
+            count = export_snapshot(rows_from_csv(args.csv), args.path)
+        else:
+            seed = __import__('seed')
+            connection = seed.connect_to_prodev()
+            if not connection:
+                sys.exit(1)
+            try:
+                count = export_snapshot(rows_from_db(connection), args.path)
+            finally:
+                connection.close()
+        print(f"Wrote {count} users to {args.path}")
+    else:
+        with Snapshot(args.path) as snap:
+            print(f"{args.path}: {len(snap)} users")
+            for user in islice(snap.stream_users(), 5):
+                print(user)
+
+
+if __name__ == "__main__":
+    main()
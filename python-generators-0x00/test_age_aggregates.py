@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Unit tests for the age_aggregates module"""
+
+import os
+import random
+import tempfile
+import unittest
+
+from age_aggregates import AgeAggregate, load_checkpoint, refresh
+
+
+def full_recompute(rows):
+    """Aggregate every (seq, age) row in one pass."""
+    return AgeAggregate().update(rows)
+
+
+class FakeCursor:
+    """Cursor answering scan_range's seq-bounded SELECT from a list."""
+
+    def __init__(self, table):
+        self.table = table
+        self.pending = []
+
+    def execute(self, query, params):
+        after = params[0]
+        upto = params[1] if len(params) > 1 else None
+        self.pending = [row for row in self.table
+                        if row[0] > after and (upto is None or row[0] <= upto)]
+
+    def fetchmany(self, size):
+        batch, self.pending = self.pending[:size], self.pending[size:]
+        return batch
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Connection over an in-memory user_data table of (seq, age) rows."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def cursor(self):
+        return FakeCursor(self.table)
+
+
+def random_rows(start, count, rng):
+    return [(seq, rng.randint(18, 120)) for seq in range(start, start + count)]
+
+
+class TestAgeAggregate(unittest.TestCase):
+    """Incremental and merged aggregates must equal a full recompute"""
+
+    def setUp(self):
+        self.rng = random.Random(42)
+        self.rows = random_rows(1, 5000, self.rng)
+
+    def assertSameAggregate(self, actual, expected):
+        self.assertEqual(actual.to_dict(), expected.to_dict())
+        for q in (1, 25, 50, 90, 99, 100):
+            self.assertEqual(actual.quantile(q), expected.quantile(q))
+
+    def test_incremental_updates_match_full_recompute(self):
+        """Folding rows in chunks gives the same result as one pass"""
+        aggregate = AgeAggregate()
+        for start in range(0, len(self.rows), 777):
+            aggregate.update(self.rows[start:start + 777])
+        self.assertSameAggregate(aggregate, full_recompute(self.rows))
+
+    def test_merged_partitions_match_full_recompute(self):
+        """Merging per-worker partial aggregates gives the full result"""
+        cuts = [0, 1000, 1001, 3500, len(self.rows)]
+        parts = [full_recompute(self.rows[lo:hi]) for lo, hi in zip(cuts, cuts[1:])]
+        merged = AgeAggregate()
+        for part in reversed(parts):
+            merged = merged.merge(part)
+        self.assertSameAggregate(merged, full_recompute(self.rows))
+
+    def test_empty_aggregate(self):
+        """An empty aggregate has no statistics and merges as identity"""
+        empty = AgeAggregate()
+        self.assertIsNone(empty.mean)
+        self.assertIsNone(empty.quantile(50))
+        full = full_recompute(self.rows)
+        self.assertSameAggregate(empty.merge(full), full)
+
+    def test_quantile_nearest_rank(self):
+        """Quantiles use the nearest-rank definition"""
+        aggregate = AgeAggregate().update([(1, 10), (2, 20), (3, 30), (4, 40)])
+        self.assertEqual(aggregate.quantile(50), 20)
+        self.assertEqual(aggregate.quantile(51), 30)
+        self.assertEqual(aggregate.quantile(100), 40)
+        self.assertEqual(aggregate.mean, 25)
+
+
+class TestRefresh(unittest.TestCase):
+    """refresh() only reads rows added since the last checkpoint"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "checkpoint.json")
+        self.rng = random.Random(7)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_refresh_resumes_from_high_water_mark(self):
+        """Successive refreshes equal a full recompute of the grown table"""
+        table = random_rows(1, 1200, self.rng)
+        connection = FakeConnection(table)
+        first = refresh(connection, self.path, fetch_size=100)
+        self.assertEqual(first.high_water, 1200)
+
+        table.extend(random_rows(1201, 300, self.rng))
+        scanned = []
+        original = FakeCursor.execute
+
+        def spy(cursor, query, params):
+            original(cursor, query, params)
+            scanned.extend(cursor.pending)
+
+        FakeCursor.execute = spy
+        try:
+            second = refresh(connection, self.path, fetch_size=100)
+        finally:
+            FakeCursor.execute = original
+
+        self.assertEqual(len(scanned), 300)
+        self.assertEqual(second.to_dict(), full_recompute(table).to_dict())
+        self.assertEqual(load_checkpoint(self.path).to_dict(), second.to_dict())
+
+    def test_refresh_without_new_rows_is_stable(self):
+        """A refresh with nothing new leaves the checkpoint unchanged"""
+        connection = FakeConnection(random_rows(1, 50, self.rng))
+        first = refresh(connection, self.path)
+        self.assertEqual(refresh(connection, self.path).to_dict(), first.to_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
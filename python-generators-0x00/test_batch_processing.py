@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Unit tests for stream_users_in_batches cleanup on early exit"""
+
+import importlib
+import unittest
+from unittest import mock
+
+try:
+    batching = importlib.import_module('1-batch_processing')
+except ImportError:  # needs mysql-connector
+    batching = None
+
+
+class UnreadResultError(Exception):
+    """Stands in for mysql-connector's InternalError: Unread result found."""
+
+
+class FakeCursor:
+    """Unbuffered cursor that, like mysql-connector's, refuses to close with unread rows."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.pending = []
+
+    def execute(self, query, params=()):
+        self.pending = list(self.connection.rows)
+
+    def fetchmany(self, size):
+        batch, self.pending = self.pending[:size], self.pending[size:]
+        return batch
+
+    def close(self):
+        if self.pending and not self.connection.drained:
+            raise UnreadResultError("Unread result found")
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.drained = False
+        self.closed = False
+        self.shut_down = False
+
+    def cursor(self, **_options):
+        return FakeCursor(self)
+
+    def consume_results(self):
+        self.drained = True
+
+    def shutdown(self):
+        self.shut_down = True
+
+    def close(self):
+        self.closed = True
+
+
+@unittest.skipIf(batching is None, "mysql-connector is not installed")
+class TestEarlyExit(unittest.TestCase):
+    """Stopping a scan early never leaks its connection"""
+
+    def setUp(self):
+        self.rows = [(f"{i:04d}", f"User {i}", f"user{i}@example.com", 30) for i in range(500)]
+
+    def test_borrowed_connection_is_drained_and_left_open(self):
+        connection = FakeConnection(self.rows)
+        batches = batching.stream_users_in_batches(50, row_format='tuple', connection=connection)
+        next(batches)
+        batches.close()
+        self.assertTrue(connection.drained)
+        self.assertFalse(connection.closed)
+
+    def test_own_connection_is_shut_down(self):
+        connection = FakeConnection(self.rows)
+        with mock.patch.object(batching.mysql.connector, 'connect', return_value=connection):
+            batches = batching.stream_users_in_batches(50, row_format='tuple', prefetch_depth=1)
+            next(batches)
+            batches.close()
+        self.assertTrue(connection.shut_down)
+
+    def test_full_scan_closes_normally(self):
+        connection = FakeConnection(self.rows)
+        with mock.patch.object(batching.mysql.connector, 'connect', return_value=connection):
+            batches = list(batching.stream_users_in_batches(50, row_format='tuple'))
+        self.assertEqual(len(batches), 10)
+        self.assertTrue(connection.closed)
+        self.assertFalse(connection.shut_down)
+
+
+if __name__ == '__main__':
+    unittest.main()
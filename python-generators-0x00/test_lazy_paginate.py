@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Unit tests for lazy_pagination's connection handling"""
+
+import importlib
+import unittest
+
+try:
+    lazy = importlib.import_module('2-lazy_paginate')
+except ImportError:  # seed needs mysql-connector
+    lazy = None
+
+
+class FakeCursor:
+    """Prepared cursor answering the OFFSET and keyset page queries."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.pending = []
+        self.column_names = lazy.USER_COLUMNS
+
+    def execute(self, query, params):
+        if "OFFSET" in query:
+            size, offset = params
+            self.pending = self.rows[offset:offset + size]
+        else:
+            # Default ordering: seek on user_id alone
+            size = params[-1]
+            after = params[0] if len(params) > 1 else None
+            self.pending = [row for row in self.rows if after is None or row[0] > after][:size]
+
+    def fetchall(self):
+        batch, self.pending = self.pending, []
+        return batch
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Connection over a list of (user_id, name, email, age) rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.closed = False
+
+    def cursor(self, **_options):
+        return FakeCursor(self.rows)
+
+    def close(self):
+        self.closed = True
+
+
+@unittest.skipIf(lazy is None, "mysql-connector is not installed")
+class TestLazyPagination(unittest.TestCase):
+    """A crawl opens one connection and closes it however it ends"""
+
+    def setUp(self):
+        self.rows = [(f"{i:04d}", f"User {i}", f"user{i}@example.com", 20 + i % 50)
+                     for i in range(230)]
+        self.connections = []
+        self.original = lazy.seed.connect_to_prodev
+
+        def connect():
+            connection = FakeConnection(self.rows)
+            self.connections.append(connection)
+            return connection
+
+        lazy.seed.connect_to_prodev = connect
+
+    def tearDown(self):
+        lazy.seed.connect_to_prodev = self.original
+
+    def test_full_crawl_uses_one_connection(self):
+        """Every page of a full crawl comes from a single connection"""
+        for mode in ("offset", "keyset"):
+            stats = {}
+            pages = list(lazy.lazy_pagination(50, mode=mode, stats=stats))
+            self.assertEqual([len(page) for page in pages], [50, 50, 50, 50, 30])
+            self.assertEqual(stats["connections_opened"], 1)
+            self.assertEqual(stats["pages"], 5)
+        self.assertEqual(len(self.connections), 2)
+        self.assertTrue(all(connection.closed for connection in self.connections))
+
+    def test_early_close_releases_connection(self):
+        """Closing the generator after one page closes its connection"""
+        stats = {}
+        pages = lazy.lazy_pagination(50, mode="keyset", stats=stats)
+        next(pages)
+        pages.close()
+        self.assertEqual(stats["connections_opened"], 1)
+        self.assertEqual(stats["pages"], 1)
+        self.assertEqual(len(self.connections), 1)
+        self.assertTrue(self.connections[0].closed)
+
+    def test_cursor_rejected_in_offset_mode(self):
+        """A resume token cannot silently restart an offset crawl"""
+        first = next(lazy.lazy_pagination(50, mode="keyset"))
+        token = lazy.page_cursor(first)
+        with self.assertRaises(ValueError):
+            next(lazy.lazy_pagination(50, mode="offset", cursor=token))
+        resumed = next(lazy.lazy_pagination(50, mode="keyset", cursor=token))
+        self.assertEqual(resumed[0]["user_id"], "0050")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Unit tests for the serial and parallel seed loaders"""
+
+import os
+import tempfile
+import unittest
+
+try:
+    seed = __import__('seed')
+except ImportError:  # seed needs mysql-connector
+    seed = None
+
+CSV = """user_id,name,email,age
+54833407-3d0f-400d-9667-d5a0129f2356,Norma Fisher,tammy76@example.com,79
+
+f9c3552b-bed1-47c9-8b79-bcb15027c09d,Steven Robinson,juancampos@example.net,30.0
+not-a-uuid,Bad Id,bad@example.com,40
+0e5d8a3c-4b0f-4d2e-9d43-1f1f3c1c8f2a,Too,Few
+
+8b3f1f0a-7c2e-4a51-9a5e-3f6d2c0b9e11,Ann Lee,ann@example.com,52
+
+"""
+
+
+class FakeCursor:
+    def __init__(self, inserted):
+        self.inserted = inserted
+
+    def executemany(self, query, rows):
+        self.inserted.extend(rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.inserted = []
+
+    def cursor(self):
+        return FakeCursor(self.inserted)
+
+    def commit(self):
+        pass
+
+
+@unittest.skipIf(seed is None, "mysql-connector is not installed")
+class TestLoadersAgree(unittest.TestCase):
+    """insert_data and the parallel shard parser accept the same rows"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(CSV)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_serial_and_sharded_parsing_agree(self):
+        connection = FakeConnection()
+        stats = seed.insert_data(connection, self.path, chunk_size=2)
+
+        rows, rejected = [], 0
+        for start, end in seed.shard_offsets(self.path, 3):
+            shard_rows, shard_rejected = seed._parse_shard((self.path, start, end))
+            rows.extend(shard_rows)
+            rejected += shard_rejected
+
+        self.assertEqual(stats["rows"], 2)
+        self.assertEqual(stats["rejected"], 3)
+        self.assertEqual(rejected, stats["rejected"])
+        self.assertEqual(sorted(rows), sorted(connection.inserted))
+
+
+if __name__ == '__main__':
+    unittest.main()
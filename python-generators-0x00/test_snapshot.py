@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Unit tests for closing snapshot readers"""
+
+import os
+import tempfile
+import unittest
+
+import snapshot
+
+ROWS = [
+    ("54833407-3d0f-400d-9667-d5a0129f2356", "Norma Fisher", "tammy76@example.com", 79),
+    ("f9c3552b-bed1-47c9-8b79-bcb15027c09d", "Steven Robinson", "juancampos@example.net", 30),
+    ("8b3f1f0a-7c2e-4a51-9a5e-3f6d2c0b9e11", "Ann Lee", "ann@example.com", 52),
+]
+
+
+class TestSnapshotClose(unittest.TestCase):
+    """close() succeeds however far a reader got"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.snap')
+        os.close(fd)
+        snapshot.export_snapshot(ROWS, self.path)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_close_with_partly_consumed_iterator(self):
+        """Leaving the with block mid-stream ends the iterator"""
+        with snapshot.Snapshot(self.path) as snap:
+            users = snap.stream_users()
+            self.assertEqual(next(users)["email"], "tammy76@example.com")
+        with self.assertRaises(StopIteration):
+            next(users)
+
+    def test_close_with_column_still_referenced(self):
+        """A column kept past close() is released, not left pinning the map"""
+        with snapshot.Snapshot(self.path) as snap:
+            ages = snap.ages
+            self.assertEqual(list(ages), [79, 30, 52])
+        with self.assertRaises(ValueError):
+            ages[0]
+
+
+if __name__ == '__main__':
+    unittest.main()